@@ -0,0 +1,169 @@
+# MIT License
+#
+# Copyright (c) 2022 Nick Rafalski
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os, json, hashlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Answers find_file lookups from memory instead of stat-ing the client extract
+# on every call. Each root is walked once (directories are listed in parallel,
+# which matters on network mounts) and the listing is saved under cache_dir()
+# keyed by directory mtimes, so later sessions only re-list directories that
+# changed. Several roots can be layered, first one wins, like the client's TRE
+# search order.
+
+CACHE_VERSION = 1
+SCAN_THREADS = 16
+
+_indexes = {}
+
+def cache_dir():
+    path = os.environ.get("IO_SCENE_SWG_CACHE") or os.path.join(os.path.expanduser("~"), ".cache", "io_scene_swg")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def split_roots(root):
+    # The extract dir setting may hold several roots separated by os.pathsep,
+    # highest priority first
+    if not root:
+        return []
+    return [r for r in root.split(os.pathsep) if r.strip() != ""]
+
+def normalize(relative_path):
+    return relative_path.replace('\\', '/').strip('/').lower()
+
+def get(root):
+    index = _indexes.get(root)
+    if index is None:
+        index = AssetIndex(split_roots(root))
+        index.build()
+        _indexes[root] = index
+    return index
+
+def invalidate(root = None):
+    # Forget one (or every) in-memory index; the next lookup re-validates
+    # against the directory mtimes
+    if root is None:
+        _indexes.clear()
+    else:
+        _indexes.pop(root, None)
+
+def _list_directory(root, rel, known):
+    # [mtime, files, subdirs] for root/rel, reusing known when it is still current
+    path = os.path.join(root, rel) if rel else root
+    try:
+        mtime = os.stat(path).st_mtime_ns
+        if known is not None and known[0] == mtime:
+            return known
+        files = []
+        subdirs = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    subdirs.append(entry.name)
+                else:
+                    files.append(entry.name)
+        return [mtime, sorted(files), sorted(subdirs)]
+    except OSError:
+        return None
+
+def scan_tree(root, known = None):
+    # {relative dir: [mtime, files, subdirs]} for every directory under root
+    known = known or {}
+    dirs = {}
+    with ThreadPoolExecutor(max_workers=SCAN_THREADS) as pool:
+        pending = {pool.submit(_list_directory, root, '', known.get('')): ''}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                rel = pending.pop(future)
+                entry = future.result()
+                if entry is None:
+                    continue
+                dirs[rel] = entry
+                for sub in entry[2]:
+                    child = f"{rel}/{sub}" if rel else sub
+                    pending[pool.submit(_list_directory, root, child, known.get(child))] = child
+    return dirs
+
+class AssetIndex(object):
+    __slots__ = ('roots', 'files')
+    def __init__(self, roots):
+        self.roots = roots
+        self.files = {}
+
+    def cache_path(self, root):
+        key = hashlib.sha1(os.path.abspath(root).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(cache_dir(), f"asset_index_{key}.json")
+
+    def load_cached(self, root):
+        try:
+            with open(self.cache_path(root), 'r') as f:
+                data = json.load(f)
+            if data.get('version') == CACHE_VERSION and data.get('root') == os.path.abspath(root):
+                return data['dirs']
+        except (OSError, ValueError, KeyError):
+            pass
+        return None
+
+    def save_cached(self, root, dirs):
+        path = self.cache_path(root)
+        try:
+            with open(path + ".tmp", 'w') as f:
+                json.dump({'version': CACHE_VERSION, 'root': os.path.abspath(root), 'dirs': dirs}, f)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print(f"Couldn't save asset index cache {path}: {e}")
+
+    def build(self):
+        self.files = {}
+        for root in self.roots:
+            known = self.load_cached(root)
+            dirs = scan_tree(root, known)
+            if dirs != known:
+                self.save_cached(root, dirs)
+            for rel, (mtime, files, subdirs) in dirs.items():
+                base = os.path.join(root, rel) if rel else root
+                prefix = f"{rel.lower()}/" if rel else ""
+                for name in files:
+                    # earlier roots take priority
+                    self.files.setdefault(prefix + name.lower(), os.path.join(base, name))
+        print(f"Asset index: {len(self.files)} files in {len(self.roots)} root(s)")
+
+    def find(self, relative_path):
+        key = normalize(relative_path)
+        path = self.files.get(key)
+        if path is not None:
+            # not checked against the disk, callers that fail to open it use forget()
+            return path
+        # Files written since the scan (e.g. converted textures) aren't indexed yet
+        parts = relative_path.replace('\\', '/').strip('/').split('/')
+        for root in self.roots:
+            candidate = os.path.join(root, *parts)
+            if os.path.isfile(candidate):
+                self.files[key] = candidate
+                return candidate
+        return None
+
+    def forget(self, relative_path):
+        # Drop an entry whose file was deleted or renamed since the scan
+        self.files.pop(normalize(relative_path), None)
@@ -0,0 +1,358 @@
+# MIT License
+#
+# Copyright (c) 2022 Nick Rafalski
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Headless batch tool over swg_types, no Blender needed:
+#
+#   python -m io_scene_swg.cli stats ~/swg/appearance
+#   python -m io_scene_swg.cli roundtrip "~/swg/appearance/mesh/*.msh" -j 8
+#   python -m io_scene_swg.cli convert ~/swg/appearance -o ~/out --optimize-vertex-cache
+
+import argparse, contextlib, glob, io, os, sys, tempfile, time, traceback
+import multiprocessing
+import numpy as np
+
+from . import mathutils_shim
+mathutils_shim.install()
+
+from . import swg_types
+from . import vertex_cache
+
+def load_msh(path, root):
+    msh = swg_types.SWGMesh(path, root)
+    return msh if msh.load() else None
+
+def flip_hardpoint_x(hardpoints):
+    # The loaders negate the x translation of [3x4 matrix, name] hardpoints for
+    # the importer, the writers take them as they are in the file
+    for hpnt in hardpoints:
+        hpnt[3] = -hpnt[3]
+
+def write_msh(msh, path):
+    flip_hardpoint_x(msh.hardpoints)
+    msh.write(path)
+
+def summarize_msh(msh):
+    return {
+        'sps': len(msh.spss),
+        'verts': sum(sps.get_vertex_count() for sps in msh.spss),
+        'tris': sum(len(sps.indices) if sps.indices is not None else len(sps.tris) for sps in msh.spss),
+        'hardpoints': len(msh.hardpoints),
+    }
+
+def validate_msh(msh):
+    problems = []
+    for sps in msh.spss:
+        if sps.indices is not None and len(sps.indices) > 0 and sps.indices.max() >= sps.get_vertex_count():
+            problems.append(f"SPS {sps.no}: index {sps.indices.max()} out of range for {sps.get_vertex_count()} verts")
+    return problems
+
+def optimize_msh(msh):
+    for sps in msh.spss:
+        if sps.indices is not None and len(sps.indices) > 0:
+            triangle_order, vertex_order, tris = vertex_cache.optimize(sps.indices, sps.vertex_count, f"SPS {sps.no}")
+            sps.reorder_vertices(vertex_order)
+            sps.tris = tris
+
+def load_mgn(path, root):
+    mgn = swg_types.SWGMgn(path, root)
+    return None if mgn.load() is False else mgn
+
+def write_mgn(mgn, path):
+    # load() keeps positions z flipped and UVs unflipped, write() wants the reverse
+    mgn.positions = mgn.positions * np.array([1, 1, -1], dtype=np.float32)
+    for psdt in mgn.psdts:
+        psdt.uvs = [np.column_stack((uv[:, 0], 1.0 - np.asarray(uv[:, 1], dtype=np.float64))) for uv in psdt.uvs]
+    mgn.filename = path
+    mgn.write()
+
+def summarize_mgn(mgn):
+    return {
+        'positions': len(mgn.positions),
+        'normals': len(mgn.normals),
+        'bones': len(mgn.bone_names),
+        'weights': len(mgn.twdt),
+        'blends': len(mgn.blends),
+        'shaders': len(mgn.psdts),
+        'tris': sum(len(prim) for psdt in mgn.psdts for prim in psdt.prims),
+    }
+
+def validate_mgn(mgn):
+    problems = []
+    num_positions = len(mgn.positions)
+    if int(np.sum(mgn.twhd)) != len(mgn.twdt):
+        problems.append(f"TWHD counts {int(np.sum(mgn.twhd))} weights but TWDT has {len(mgn.twdt)}")
+    if len(mgn.twdt) > 0 and int(mgn.twdt['bone'].max()) >= len(mgn.bone_names):
+        problems.append(f"weight references bone {int(mgn.twdt['bone'].max())} of {len(mgn.bone_names)}")
+    for blend in mgn.blends:
+        if len(blend.positions) > 0 and int(blend.positions['index'].max()) >= num_positions:
+            problems.append(f"blend {blend.name} moves position {int(blend.positions['index'].max())} of {num_positions}")
+    for psdt in mgn.psdts:
+        pidx = np.asarray(psdt.pidx)
+        if len(pidx) > 0 and pidx.max() >= num_positions:
+            problems.append(f"{psdt.name}: position index {pidx.max()} of {num_positions}")
+        nidx = np.asarray(psdt.nidx)
+        if len(nidx) > 0 and nidx.max() >= len(mgn.normals):
+            problems.append(f"{psdt.name}: normal index {nidx.max()} of {len(mgn.normals)}")
+        for prim in psdt.prims:
+            for tri in prim:
+                if max(tri.p1, tri.p2, tri.p3) >= len(pidx):
+                    problems.append(f"{psdt.name}: triangle references vertex {max(tri.p1, tri.p2, tri.p3)} of {len(pidx)}")
+                    break
+    return problems
+
+def load_lod(path, root):
+    lod = swg_types.LodFile(path)
+    return None if lod.load(path) is False else lod
+
+def write_lod(lod, path):
+    flip_hardpoint_x(lod.hardpoints)
+    lod.write(path)
+
+def summarize_lod(lod):
+    return {'lods': len(lod.lods), 'hardpoints': len(lod.hardpoints)}
+
+def load_flr(path, root):
+    flr = swg_types.FloorFile(path)
+    return flr if flr.load() else None
+
+def write_flr(flr, path):
+    flr.path = path
+    flr.write()
+
+def summarize_flr(flr):
+    graph = flr.pathGraph
+    return {
+        'verts': len(flr.verts),
+        'tris': len(flr.tris),
+        'nodes': len(graph.nodes) if graph else 0,
+        'edges': len(graph.edges) if graph else 0,
+    }
+
+def validate_flr(flr):
+    problems = []
+    for i, tri in enumerate(flr.tris):
+        corners = (tri.corner1, tri.corner2, tri.corner3)
+        if max(corners) >= len(flr.verts):
+            problems.append(f"triangle {i} references vert {max(corners)} of {len(flr.verts)}")
+        neighbors = (tri.nindex1, tri.nindex2, tri.nindex3)
+        if max(neighbors) >= len(flr.tris):
+            problems.append(f"triangle {i} neighbors triangle {max(neighbors)} of {len(flr.tris)}")
+    return problems
+
+def load_pob(path, root):
+    pob = swg_types.PobFile(path)
+    return None if pob.load() is False else pob
+
+def write_pob(pob, path):
+    for cell in pob.cells:
+        flip_hardpoint_x([portal.doorhardpoint for portal in cell.portals if portal.doorhardpoint])
+        flip_hardpoint_x([light.transform for light in cell.lights])
+    pob.write(path)
+
+def summarize_pob(pob):
+    return {'portals': len(pob.portals), 'cells': len(pob.cells)}
+
+def validate_pob(pob):
+    problems = []
+    for cell in pob.cells:
+        for portal in cell.portals:
+            if portal.id >= len(pob.portals):
+                problems.append(f"cell {cell.name} uses portal {portal.id} of {len(pob.portals)}")
+            if portal.connecting_cell >= len(pob.cells):
+                problems.append(f"cell {cell.name} connects to cell {portal.connecting_cell} of {len(pob.cells)}")
+    return problems
+
+def load_apt(path, root):
+    apt = swg_types.AptFile(path)
+    apt.load()
+    return apt
+
+def write_apt(apt, path):
+    apt.filename = path
+    apt.write()
+
+def summarize_apt(apt):
+    return {'reference': apt.reference}
+
+def no_problems(obj):
+    return []
+
+# extension: (load(path, root), write(obj, path), summarize(obj), validate(obj))
+FORMATS = {
+    '.msh': (load_msh, write_msh, summarize_msh, validate_msh),
+    '.mgn': (load_mgn, write_mgn, summarize_mgn, validate_mgn),
+    '.lod': (load_lod, write_lod, summarize_lod, no_problems),
+    '.flr': (load_flr, write_flr, summarize_flr, validate_flr),
+    '.pob': (load_pob, write_pob, summarize_pob, validate_pob),
+    '.apt': (load_apt, write_apt, summarize_apt, no_problems),
+}
+
+OPTIMIZERS = {
+    '.msh': optimize_msh,
+}
+
+def collect_files(patterns):
+    # Files, globs, or directory trees (walked for every extension in FORMATS)
+    files = []
+    for pattern in patterns:
+        pattern = os.path.expanduser(pattern)
+        matches = glob.glob(pattern, recursive=True) if glob.has_magic(pattern) else [pattern]
+        for match in sorted(matches):
+            if os.path.isdir(match):
+                for dirpath, dirnames, filenames in os.walk(match):
+                    dirnames.sort()
+                    for name in sorted(filenames):
+                        if os.path.splitext(name)[1].lower() in FORMATS:
+                            files.append(os.path.join(dirpath, name))
+            elif os.path.splitext(match)[1].lower() in FORMATS:
+                files.append(match)
+            else:
+                print(f"Skipping {match}: not a supported file type")
+    return list(dict.fromkeys(files))
+
+def load_checked(path, root):
+    load, write, summarize, validate = FORMATS[os.path.splitext(path)[1].lower()]
+    obj = load(path, root)
+    if obj is None:
+        raise ValueError("unsupported or unreadable file")
+    return obj, summarize(obj), validate(obj)
+
+def do_stats(path, options):
+    obj, summary, problems = load_checked(path, options.root)
+    return ('ok' if not problems else 'invalid'), summary, problems
+
+def do_roundtrip(path, options):
+    ext = os.path.splitext(path)[1].lower()
+    write = FORMATS[ext][1]
+    obj, summary, problems = load_checked(path, options.root)
+    fd, temp_path = tempfile.mkstemp(suffix=ext)
+    os.close(fd)
+    try:
+        write(obj, temp_path)
+        with open(path, 'rb') as f:
+            original = f.read()
+        with open(temp_path, 'rb') as f:
+            rewritten = f.read()
+        if original == rewritten:
+            status = 'identical'
+        else:
+            again, again_summary, again_problems = load_checked(temp_path, options.root)
+            status = 'equivalent' if again_summary == summary and not again_problems else 'differs'
+            if status == 'differs':
+                problems = problems + [f"rewritten file summary: {again_summary}"] + again_problems
+    finally:
+        os.remove(temp_path)
+    if problems and status != 'differs':
+        status = 'invalid'
+    return status, summary, problems
+
+def do_convert(path, options):
+    ext = os.path.splitext(path)[1].lower()
+    write = FORMATS[ext][1]
+    obj, summary, problems = load_checked(path, options.root)
+    if options.optimize_vertex_cache and ext in OPTIMIZERS:
+        OPTIMIZERS[ext](obj)
+    base = options.base if options.base else os.path.dirname(path)
+    out_path = os.path.join(options.output, os.path.relpath(path, base))
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    write(obj, out_path)
+    return ('converted' if not problems else 'invalid'), summary, problems
+
+COMMANDS = {
+    'stats': do_stats,
+    'roundtrip': do_roundtrip,
+    'convert': do_convert,
+}
+
+def run_one(job):
+    # Runs in a pool worker. The loaders are chatty, so their output is only
+    # passed back when asked for or when something goes wrong
+    path, options = job
+    start = time.time()
+    log = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(log):
+            status, summary, problems = COMMANDS[options.command](path, options)
+    except Exception:
+        status, summary, problems = 'failed', {}, [traceback.format_exc().rstrip()]
+    output = log.getvalue() if (options.verbose or status in ('failed', 'differs')) else ""
+    return path, status, summary, problems, output, time.time() - start
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(prog="python -m io_scene_swg.cli",
+                                     description="Batch load, validate, re-write and convert SWG files without Blender.")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("paths", nargs='+', help="files, glob patterns or directories to walk")
+    common.add_argument("-r", "--root", default="", help="client extract dir used to resolve shader references")
+    common.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="worker processes (default: all cores)")
+    common.add_argument("-v", "--verbose", action='store_true', help="print the loader output for every file")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('stats', parents=[common], help="load, validate and summarize each file")
+    commands.add_parser('roundtrip', parents=[common], help="load, validate, re-write and compare each file")
+    convert = commands.add_parser('convert', parents=[common], help="re-write each file in the current format version")
+    convert.add_argument("-o", "--output", required=True, help="output directory")
+    convert.add_argument("--base", default=None, help="strip this dir from input paths when laying out the output (default: flat)")
+    convert.add_argument("--optimize-vertex-cache", action='store_true', help="reorder .msh triangles and vertices for the post-transform cache")
+    options = parser.parse_args(argv)
+
+    files = collect_files(options.paths)
+    if len(files) == 0:
+        print("No files found")
+        return 1
+
+    start = time.time()
+    counts = {}
+    totals = {}
+    jobs = [(path, options) for path in files]
+    if options.jobs > 1 and len(files) > 1:
+        pool = multiprocessing.Pool(min(options.jobs, len(files)))
+        results = pool.imap_unordered(run_one, jobs, chunksize=max(1, len(files) // (options.jobs * 8)))
+    else:
+        pool = None
+        results = map(run_one, jobs)
+
+    try:
+        for path, status, summary, problems, output, seconds in results:
+            counts[status] = counts.get(status, 0) + 1
+            ext_totals = totals.setdefault(os.path.splitext(path)[1].lower(), {'files': 0})
+            ext_totals['files'] += 1
+            for key, value in summary.items():
+                if isinstance(value, int):
+                    ext_totals[key] = ext_totals.get(key, 0) + value
+            print(f"[{status}] {path} ({seconds:.2f}s) " + " ".join(f"{k}={v}" for k, v in summary.items()))
+            for problem in problems:
+                print("    " + problem.replace("\n", "\n    "))
+            if output:
+                print("    " + output.rstrip().replace("\n", "\n    "))
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    for ext, ext_totals in sorted(totals.items()):
+        print(f"{ext}: " + " ".join(f"{k}={v}" for k, v in ext_totals.items()))
+    print(f"{len(files)} files in {time.time() - start:.2f}s: " + ", ".join(f"{v} {k}" for k, v in sorted(counts.items())))
+    return 1 if any(status in ('failed', 'invalid', 'differs') for status in counts) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -30,7 +30,9 @@ from . import swg_types
 from . import vertex_buffer_format
 from . import data_types
 from . import support
+from . import pathgraph_builder
 import mathutils
+import numpy as np
 
 from mathutils import Matrix, Vector, Color
 from bpy_extras import io_utils, node_shader_utils
@@ -128,10 +130,7 @@ def export_one(fullpath, current_obj, portal_objects, use_object_name=True):
                 index += 1
         
         
-    flr.add_portal_nodes(globalPortalIndecies)
-    flr.make_waypoint_connections()
-    flr.prune_redundant_edges()
-    flr.add_portal_edges()    
+    pathgraph_builder.PathGraphBuilder(flr).build(globalPortalIndecies)
 
     flr.write()
     now = time.time()
@@ -158,12 +157,24 @@ def create_floor_triangles_from_mesh(obj, me, portal_objects):
             edge_types[tuple(edge.vertices)] = swg_types.FloorTri.WallTop
             edge_types[tuple(reversed)] = swg_types.FloorTri.WallTop
 
-    usedPortals = []
+    # Faces using each edge, keyed by the sorted vertex pair, so finding a
+    # triangle's neighbours doesn't mean scanning every other triangle
+    faces_by_edge = {}
     for t1 in me.polygons:
         if(len(t1.vertices) != 3):
             print(f"Error. Triangle {t1.index} has {len(t1.vertices)} vertices. Only triangles supported!")
             return {'CANCELLED'}
+        for a, b in floor_tri_edges(t1.vertices):
+            faces_by_edge.setdefault((min(a, b), max(a, b)), []).append(t1.index)
+
+    def neighbour(a, b, index):
+        others = [f for f in faces_by_edge[(min(a, b), max(a, b))] if f != index]
+        return others[-1] if len(others) > 0 else -1
 
+    portals = convert_portal_meshes(portal_objects)
+
+    usedPortals = []
+    for t1 in me.polygons:
         ft = swg_types.FloorTri()
         ft.index = t1.index
         ft.corner1 = t1.vertices[0]
@@ -179,57 +190,41 @@ def create_floor_triangles_from_mesh(obj, me, portal_objects):
         ft.edgeType2 = edge_types[tuple(t1e2)]
         ft.edgeType3 = edge_types[tuple(t1e3)]
 
-        for t2 in [x for x in me.polygons if x.index != t1.index]:
-            t2e1 = set([t2.vertices[0],t2.vertices[2]])
-            t2e2 = set([t2.vertices[2],t2.vertices[1]])
-            t2e3 = set([t2.vertices[1],t2.vertices[0]])
-
-            if t1e1 in [t2e1, t2e2, t2e3]:
-                ft.nindex1 = t2.index
-            if t1e2 in [t2e1, t2e2, t2e3]:
-                ft.nindex2 = t2.index
-            if t1e3 in [t2e1, t2e2, t2e3]:
-                ft.nindex3 = t2.index
+        ft.nindex1 = neighbour(t1.vertices[0], t1.vertices[2], t1.index)
+        ft.nindex2 = neighbour(t1.vertices[2], t1.vertices[1], t1.index)
+        ft.nindex3 = neighbour(t1.vertices[1], t1.vertices[0], t1.index)
 
         ft.normal = support.convert_vector3([-t1.normal.x, -t1.normal.y, -t1.normal.z])        
 
-        for portalIndex, pair in enumerate(portal_objects):
-            portalObj = pair[0]
-            pid=pair[1]
-            if portalObj.type != 'MESH':
-                print(f"{portalObj.name} is not a MESH, skipping!")
-                continue
-            else:
-                if (ft.nindex1 != -1) and (ft.nindex2 != -1) and (ft.nindex3 != -1):
-                    # non-boundary triangle, skip
-                    continue
-
-                portalMesh = portalObj.to_mesh()
-
-                for portalTri in portalMesh.polygons:
-                    portalVerts = [portalMesh.vertices[p].co for p in portalTri.vertices] 
-                    floortVerts = [me.vertices[p].co for p in t1.vertices]
-                    p1InTri = mathutils.geometry.intersect_point_tri(floortVerts[0], portalVerts[0], portalVerts[1], portalVerts[2])
-                    dist0 = (p1InTri - floortVerts[0]).length < 0.01 if p1InTri != None else False
-                    p2InTri = mathutils.geometry.intersect_point_tri(floortVerts[1], portalVerts[0], portalVerts[1], portalVerts[2])
-                    dist1 = (p2InTri - floortVerts[1]).length < 0.01 if p2InTri != None else False
-                    p3InTri = mathutils.geometry.intersect_point_tri(floortVerts[2], portalVerts[0], portalVerts[1], portalVerts[2])
-                    dist2 = (p3InTri - floortVerts[2]).length < 0.01 if p3InTri != None else False
-                    #print(f"FloorTri {t1.index} p0 ({t1.vertices[0]} = {floortVerts[0]} is in portal: {portalObj.name} tri {portalTri.index} at {p1InTri} Dist: {dist0}")
-                    #print(f"FloorTri {t1.index} p1 ({t1.vertices[1]} = {floortVerts[1]} is in portal: {portalObj.name} tri {portalTri.index} at {p2InTri} Dist: {dist1}")
-                    #print(f"FloorTri {t1.index} p2 ({t1.vertices[2]} = {floortVerts[2]} is in portal: {portalObj.name} tri {portalTri.index} at {p3InTri} Dist: {dist2}")
-                    if dist0 and dist1:
-                        print(f"   Intersection found: floorTri {t1.index}, Edge: {ft.corner1} - {ft.corner2} portalMesh {portalObj.name}: tri {portalTri.index} portalId3 = {pid}")
-                        ft.portalId3 = portalIndex
-                        usedPortals.append(portalObj)
-                    if dist1 and dist2:
-                        print(f"   Intersection found: floorTri {t1.index}, Edge: {ft.corner2} - {ft.corner3} portalMesh {portalObj.name}: tri {portalTri.index} portalId2 = {pid}")
-                        ft.portalId2 = portalIndex
-                        usedPortals.append(portalObj)
-                    if dist2 and dist0:
-                        print(f"   Intersection found: floorTri {t1.index}, Edge: {ft.corner3} - {ft.corner1} portalMesh {portalObj.name}: tri {portalTri.index} portalId1 = {pid}")
-                        ft.portalId1 = portalIndex
-                        usedPortals.append(portalObj)
+        if (ft.nindex1 != -1) and (ft.nindex2 != -1) and (ft.nindex3 != -1):
+            # non-boundary triangle, can't be on a portal
+            tris.append(ft)
+            continue
+
+        floortVerts = [me.vertices[p].co for p in t1.vertices]
+        floortPoints = np.array([list(v) for v in floortVerts])
+        for portalIndex, portalObj, pid, portalTris, boxMin, boxMax in portals:
+            # A floor edge can only lie on a portal tri if both its ends are
+            # inside the tri's (slightly grown) bounding box
+            inBox = np.all((floortPoints[None, :, :] >= boxMin[:, None, :]) & (floortPoints[None, :, :] <= boxMax[:, None, :]), axis=2)
+            for portalTriIndex in np.flatnonzero(inBox.sum(axis=1) >= 2):
+                portalVerts = portalTris[portalTriIndex]
+                dist = []
+                for i in range(0, 3):
+                    pInTri = mathutils.geometry.intersect_point_tri(floortVerts[i], portalVerts[0], portalVerts[1], portalVerts[2])
+                    dist.append((pInTri - floortVerts[i]).length < PORTAL_TOLERANCE if pInTri != None else False)
+                if dist[0] and dist[1] and ft.nindex3 == -1:
+                    print(f"   Intersection found: floorTri {t1.index}, Edge: {ft.corner1} - {ft.corner3} portalMesh {portalObj.name}: tri {portalTriIndex} portalId3 = {pid}")
+                    ft.portalId3 = portalIndex
+                    usedPortals.append(portalObj)
+                if dist[1] and dist[2] and ft.nindex2 == -1:
+                    print(f"   Intersection found: floorTri {t1.index}, Edge: {ft.corner3} - {ft.corner2} portalMesh {portalObj.name}: tri {portalTriIndex} portalId2 = {pid}")
+                    ft.portalId2 = portalIndex
+                    usedPortals.append(portalObj)
+                if dist[2] and dist[0] and ft.nindex1 == -1:
+                    print(f"   Intersection found: floorTri {t1.index}, Edge: {ft.corner2} - {ft.corner1} portalMesh {portalObj.name}: tri {portalTriIndex} portalId1 = {pid}")
+                    ft.portalId1 = portalIndex
+                    usedPortals.append(portalObj)
 
         tris.append(ft)    
 
@@ -242,4 +237,29 @@ def create_floor_triangles_from_mesh(obj, me, portal_objects):
     if unusedCount == 0:
         print(f"{obj.name}: all passsable portals were used!")
 
-    return tris
\ No newline at end of file
+    return tris
+
+PORTAL_TOLERANCE = 0.01
+
+def floor_tri_edges(vertices):
+    # Edges in FloorTri order: edge 1 is corner1-corner2, i.e. vertices 0 and 2
+    return [(vertices[0], vertices[2]), (vertices[2], vertices[1]), (vertices[1], vertices[0])]
+
+def convert_portal_meshes(portal_objects):
+    # Each portal mesh is converted once. Returns (portalIndex, obj, pid,
+    # triangle corners, per-triangle bounding box min, max)
+    portals = []
+    for portalIndex, pair in enumerate(portal_objects):
+        portalObj = pair[0]
+        pid = pair[1]
+        if portalObj.type != 'MESH':
+            print(f"{portalObj.name} is not a MESH, skipping!")
+            continue
+
+        portalMesh = portalObj.to_mesh()
+        portalTris = [[Vector(portalMesh.vertices[p].co) for p in portalTri.vertices[0:3]] for portalTri in portalMesh.polygons]
+        points = np.array([[list(v) for v in tri] for tri in portalTris]).reshape(-1, 3, 3)
+        boxMin = points.min(axis=1) - PORTAL_TOLERANCE
+        boxMax = points.max(axis=1) + PORTAL_TOLERANCE
+        portals.append((portalIndex, portalObj, pid, portalTris, boxMin, boxMax))
+    return portals
@@ -19,17 +19,101 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
-import bpy, collections, array, base64, time, datetime, bmesh, os
+import bpy, base64, time, datetime, bmesh, os
+import numpy as np
 from bpy.props import *
 from . import swg_types
-from . import data_types
+from . import vertex_cache
+
+# Decimal places NORM and DOT3 entries are rounded to before sharing
+TABLE_PLACES = 3
 
 oznfulllist = ['face','neck','skull','sideburn_l','sideburn_r','chest','torso_f','torso_b','waist_f','waist_b','r_thigh','r_shin','r_foot','l_thigh','l_shin','l_foot','r_arm','r_forearm','r_hand','l_arm','l_forearm','l_hand']
 
 
-def roundedVec3(n):
-    return round(n[0], 3), round(n[1], 3), round(n[2], 3)
-        
+def to_swg_axes(v):
+    # Blender (x, y, z) -> SWG (-x, z, -y), row-wise
+    return v[:, [0, 2, 1]] * [-1, 1, -1]
+
+def unique_rows(rows, places):
+    # Rows rounded to places, numbered in the order they're first seen. Returns the
+    # unique rows, each input row's index into them and the first row of each
+    keys = np.round(rows, places) + 0.0
+    unique, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    remap = np.empty_like(order)
+    remap[order] = np.arange(len(order))
+    return unique[order], remap[inverse.ravel()], first[order]
+
+def optimize_psdt(psdt):
+    # Welds the per-loop PSDT corners that are identical, then reorders triangles
+    # and vertices for the vertex cache. Returns the new triangle order
+    corners = np.array(psdt.prims[0], dtype=np.int64).reshape(-1, 3)
+    columns = [np.array(psdt.pidx, dtype=np.float64), np.array(psdt.nidx, dtype=np.float64)]
+    if psdt.dot3:
+        columns.append(np.array(psdt.dot3, dtype=np.float64))
+    uvs = np.array([list(uv) for uv in psdt.uvs[0]], dtype=np.float64).reshape(-1, 2)
+    welded, remap, first = unique_rows(np.column_stack(columns + [uvs]), 6)
+
+    triangle_order, vertex_order, tris = vertex_cache.optimize(remap[corners], len(welded), f"PSDT {psdt.name}")
+    source = first[vertex_order]
+    psdt.pidx = np.array(psdt.pidx)[source].tolist()
+    psdt.nidx = np.array(psdt.nidx)[source].tolist()
+    if psdt.dot3:
+        psdt.dot3 = np.array(psdt.dot3)[source].tolist()
+    psdt.uvs[0] = uvs[source].tolist()
+    psdt.prims[0] = tris.ravel().tolist()
+    return triangle_order
+
+def sparse_blend_deltas(deltas, epsilon):
+    # Keeps only the rows of deltas with a component larger than epsilon
+    deltas = np.asarray(deltas, dtype=np.float64).reshape(-1, 3)
+    keep = np.flatnonzero(np.abs(deltas).max(axis=1, initial=0.0) > epsilon)
+    packed = np.zeros(len(keep), dtype=swg_types.SWGMgn.BLEND_DELTA_DTYPE)
+    packed['index'] = keep
+    packed['delta'] = deltas[keep]
+    return packed
+
+def vertex_weight_table(vertices, max_transforms):
+    # One pass over the vertex groups, then TWHD counts and TWDT (bone, weight) records
+    # with each vertex's weights heaviest first. Vertices with more than max_transforms
+    # weights keep the heaviest ones, renormalized to their original total.
+    verts = []
+    bones = []
+    weights = []
+    for v in vertices:
+        for g in v.groups:
+            verts.append(v.index)
+            bones.append(g.group)
+            weights.append(g.weight)
+    verts = np.array(verts, dtype=np.int64)
+    bones = np.array(bones, dtype=np.uint32)
+    weights = np.array(weights, dtype=np.float64)
+
+    order = np.lexsort((bones, -weights, verts))
+    verts, bones, weights = verts[order], bones[order], weights[order]
+
+    twhd = np.bincount(verts, minlength=len(vertices))
+    starts = np.concatenate(([0], np.cumsum(twhd)[:-1]))
+    if max_transforms > 0 and len(verts) > 0:
+        rank = np.arange(len(verts)) - starts[verts]
+        keep = rank < max_transforms
+        over = np.flatnonzero(twhd > max_transforms)
+        if len(over) > 0:
+            print(f"Limiting {len(over)} vertices to {max_transforms} bone weights")
+            totals = np.bincount(verts, weights, minlength=len(vertices))
+            kept_totals = np.bincount(verts[keep], weights[keep], minlength=len(vertices))
+            scale = np.ones(len(vertices))
+            scale[over] = np.divide(totals[over], kept_totals[over], out=np.ones(len(over)), where=kept_totals[over] != 0)
+            weights = weights * scale[verts]
+        verts, bones, weights = verts[keep], bones[keep], weights[keep]
+        twhd = np.bincount(verts, minlength=len(vertices))
+
+    twdt = np.zeros(len(verts), dtype=swg_types.SWGMgn.TWDT_DTYPE)
+    twdt['bone'] = bones
+    twdt['weight'] = weights
+    return twhd.astype(np.uint32), twdt
+
 def mesh_triangulate(me):
     bm = bmesh.new()
     bm.from_mesh(me)
@@ -40,7 +124,10 @@ def mesh_triangulate(me):
 def export_mgn(context, 
                filepath, 
                *,
-               do_tangents = True):    
+               do_tangents = True,
+               blend_epsilon = 0.0001,
+               max_transforms_vertex = 4,
+               optimize_vertex_cache = False):    
     starttime = time.time()
     
     s=context.preferences.addons[__package__].preferences.swg_root
@@ -71,12 +158,10 @@ def export_mgn(context,
     
     bm.calc_normals_split()
 
-    t_ln = array.array(data_types.ARRAY_FLOAT64, (0.0,)) * len(bm.loops) * 3
-    bm.loops.foreach_get("normal", t_ln)
-    normals = list(map(list, zip(*[iter(t_ln)]*3)))    
+    normals = np.zeros(len(bm.loops) * 3, dtype=np.float64)
+    bm.loops.foreach_get("normal", normals)
     
     if do_tangents:
-        t_ln = array.array(data_types.ARRAY_FLOAT64, [0.0,]) * len(bm.loops) * 3
         uv_names = [uvlayer.name for uvlayer in bm.uv_layers]
         for name in uv_names:
             #print(f"Did tangents for UV map: {name}")
@@ -111,41 +196,54 @@ def export_mgn(context,
     for vert in bm.vertices:
         mgn.positions.append([-vert.co[0],vert.co[2],-vert.co[1]])
 
-    reverse_normal_lookup={}
-    normal_index=0
-    all_normals=[]
-    for normal in normals:
-        converted_normal=roundedVec3([-normal[0], normal[2], -normal[1]])
-        if not converted_normal in reverse_normal_lookup.keys():
-            reverse_normal_lookup[converted_normal] = normal_index
-            #print(f"{converted_normal} : {normal_index}")
-            normal_index += 1
-            mgn.normals.append(converted_normal)
-            #mgn.normals.append([-normal[0], normal[2], -normal[1]])
-        all_normals.append(normal)
+    # NORM and DOT3 are shared tables; NIDX and the PSDT DOT3 indices point into them per loop
+    loop_normals = to_swg_axes(normals.reshape(-1, 3))
+    mgn.normals, loop_normal_indices, normal_loops = unique_rows(loop_normals, TABLE_PLACES)
 
     if do_tangents:
-        mgn.dot3=[]
-        for i, loop in enumerate(bm.loops):
-            tang = loop.tangent
-            mgn.dot3.append([ -tang[0], tang[2], -tang[1], loop.bitangent_sign])
+        tangents = np.zeros(len(bm.loops) * 3, dtype=np.float64)
+        bm.loops.foreach_get("tangent", tangents)
+        signs = np.zeros(len(bm.loops), dtype=np.float64)
+        bm.loops.foreach_get("bitangent_sign", signs)
+        loop_dot3 = np.column_stack([to_swg_axes(tangents.reshape(-1, 3)), signs])
+        mgn.dot3, loop_dot3_indices, dot3_loops = unique_rows(loop_dot3, TABLE_PLACES)
 
     for keys in bpy.data.shape_keys:
         if keys == bm.shape_keys:
-            for key in keys.key_blocks[1:]:
+            basis = keys.key_blocks[0]
+            num_verts = len(basis.data)
+            loop_verts = np.zeros(len(bm.loops), dtype=np.int32)
+            bm.loops.foreach_get("vertex_index", loop_verts)
+            # Each shared normal or tangent takes its delta from the vertex of the first loop that uses it
+            normal_verts = loop_verts[normal_loops]
+
+            basis_co = np.zeros(num_verts * 3, dtype=np.float32)
+            basis.data.foreach_get("co", basis_co)
+            basis_normals = np.array(basis.normals_vertex_get(), dtype=np.float64).reshape(-1, 3)
+            if do_tangents:
+                dot3_normals = loop_normals[dot3_loops]
+                dot3_verts = loop_verts[dot3_loops]
+                dot3_tangents = mgn.dot3[:, :3]
 
+            for key in keys.key_blocks[1:]:
                 blt = swg_types.SWGBLendShape()
                 blt.name = key.name
-                blt.dot3 = []
-                basis = keys.key_blocks[0].data
-                for j, kv in enumerate(key.data):
-                    delta = kv.co - basis[j].co
-                    #if delta[0] != 0 and delta[1] != 0 and delta[2] != 0:
-                    blt.positions.append([j, [-delta[0], delta[2], -delta[1]]])
-                    if do_tangents:
-                        blt.dot3.append([j, [0,0,0]])
-                for n, norm in enumerate(reverse_normal_lookup):                    
-                    blt.normals.append([n, [0,0,0]])
+
+                co = np.zeros(num_verts * 3, dtype=np.float32)
+                key.data.foreach_get("co", co)
+                blt.positions = sparse_blend_deltas(to_swg_axes((co - basis_co).reshape(-1, 3)), blend_epsilon)
+
+                normal_deltas = to_swg_axes(np.array(key.normals_vertex_get(), dtype=np.float64).reshape(-1, 3) - basis_normals)
+                blt.normals = sparse_blend_deltas(normal_deltas[normal_verts], blend_epsilon)
+
+                if do_tangents:
+                    # Blender has no per-key tangents, so re-orthogonalize each tangent
+                    # against its loop's morphed normal and store the difference
+                    morphed = dot3_normals + normal_deltas[dot3_verts]
+                    morphed /= np.maximum(np.linalg.norm(morphed, axis=1), 1e-12)[:, None]
+                    morphed_tangents = dot3_tangents - morphed * np.einsum('ij,ij->i', dot3_tangents, morphed)[:, None]
+                    morphed_tangents /= np.maximum(np.linalg.norm(morphed_tangents, axis=1), 1e-12)[:, None]
+                    blt.dot3 = sparse_blend_deltas(morphed_tangents - dot3_tangents, blend_epsilon)
                 mgn.blends.append(blt)
             
     face_index_pairs = [(face, index) for index, face in enumerate(bm.polygons)]
@@ -187,13 +285,11 @@ def export_mgn(context,
 
                 psdt.pidx.append(master_vert_id)
                 #psdt.nidx.append(l_index)
-                normal = all_normals[l_index]
-                converted_normal=roundedVec3([-normal[0], normal[2], -normal[1]])
-                psdt.nidx.append(reverse_normal_lookup[converted_normal])
+                psdt.nidx.append(loop_normal_indices[l_index])
                 psdt.uvs[0].append(uv_layer[l_index].uv)
 
                 if do_tangents:
-                    psdt.dot3.append(l_index)
+                    psdt.dot3.append(loop_dot3_indices[l_index])
                 
                 if last_tri_index == None:
                     last_tri_index = l_index
@@ -213,21 +309,21 @@ def export_mgn(context,
 
                 running_tri_index += 1
 
+    if optimize_vertex_cache:
+        # Triangles move within their PSDT, so occlusion zone membership follows them
+        new_tri_index = []
+        for psdt in mgn.psdts:
+            triangle_order = optimize_psdt(psdt)
+            moved = np.empty(len(triangle_order), dtype=np.int64)
+            moved[triangle_order] = np.arange(len(triangle_order)) + len(new_tri_index)
+            new_tri_index.extend(moved.tolist())
+        blender_tri_index_to_my_tri_index = {k: new_tri_index[v] for k, v in blender_tri_index_to_my_tri_index.items()}
+
     vertex_groups = current_obj.vertex_groups
-    bone_names = vertex_groups.keys()
-    twdtdata = {}
-    for name in bone_names:
-        mgn.bone_names.append(name)
-        selverts = [v for v in bm.vertices]
-        indexval = current_obj.vertex_groups[name].index
-        for v in selverts:
-            for n in v.groups:
-                if n.group == indexval:
-                    if not v.index in twdtdata:
-                        twdtdata[v.index] = []
-                    twdtdata[v.index].append([indexval, n.weight])
-    od = collections.OrderedDict(sorted(twdtdata.items()))
-    mgn.twdt = list(od.values())
+    mgn.bone_names = vertex_groups.keys()
+    twhd, twdt = vertex_weight_table(bm.vertices, max_transforms_vertex)
+    mgn.set_vertex_weights(twhd, twdt)
+    mgn.max_transforms_vertex = int(twhd.max(initial=0))
 
     if len(current_obj.face_maps) > 0:
         mgn.occlusion_zones=[]
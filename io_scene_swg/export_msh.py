@@ -24,13 +24,14 @@ import os
 import bpy
 import base64
 import bmesh
-import time, datetime, array, functools, math
+import time, datetime, functools, math
+import numpy as np
 from . import vector3D
 from . import swg_types
 from . import vertex_buffer_format
-from . import data_types
 from . import extents
 from . import support
+from . import vertex_cache
 
 from mathutils import Matrix, Vector, Color
 from bpy_extras import io_utils, node_shader_utils
@@ -52,7 +53,8 @@ def mesh_triangulate(me):
 def save(context,
          filepath,
          *,
-         flip_uv_vertical=False
+         flip_uv_vertical=False,
+         optimize_vertex_cache=False
          ):
 
     objects = context.selected_objects
@@ -72,19 +74,16 @@ def save(context,
             dirname = os.path.dirname(filepath)
             fullpath = os.path.join(dirname, ob.name+".msh")
             extract_dir=context.preferences.addons[__package__].preferences.swg_root
-            result = export_one(fullpath, extract_dir, ob, flip_uv_vertical)
+            result = export_one(fullpath, extract_dir, ob, flip_uv_vertical, optimize_vertex_cache)
             if not 'FINISHED' in result:
                 return {'CANCELLED'}
     return {'FINISHED'}
 
-def export_one(fullpath, extract_dir, obj, flip_uv_vertical):
+def export_one(fullpath, extract_dir, obj, flip_uv_vertical, optimize_vertex_cache=False):
     newMsh = swg_types.SWGMesh(fullpath, extract_dir)
     start = time.time()
     print(f'Exporting msh: {fullpath} Flip UV: {flip_uv_vertical}')
 
-    def veckey2d(n, v):
-        return round(n[0], 4), round(n[1], 4), round(n[2], 4), round(v[0], 4), round(v[1], 4) 
-                
     me = obj.to_mesh() 
     mesh_triangulate(me)    
     me.calc_normals_split()
@@ -92,15 +91,11 @@ def export_one(fullpath, extract_dir, obj, flip_uv_vertical):
     for layer in me.vertex_colors:
         print(f"Color layer: {layer.name}")
 
-    t_ln = array.array(data_types.ARRAY_FLOAT64, (0.0,)) * len(me.loops) * 3
-    me.loops.foreach_get("normal", t_ln)
-    normals = list(map(list, zip(*[iter(t_ln)]*3)))   
-    uv_maps=[]
-    
-    for layer in me.uv_layers:
-        uv_maps.append(layer.data[:])
+    num_loops = len(me.loops)
+    normals = np.zeros(num_loops * 3, dtype=np.float64)
+    me.loops.foreach_get("normal", normals)
+    normals = normals.reshape(-1, 3)
 
-    t_ln = array.array(data_types.ARRAY_FLOAT64, [0.0,]) * len(me.loops) * 3
     uv_names = [uvlayer.name for uvlayer in me.uv_layers]
 
     for name in uv_names:
@@ -110,11 +105,43 @@ def export_one(fullpath, extract_dir, obj, flip_uv_vertical):
     if obj.matrix_world.determinant() < 0.0:
         me.flip_normals()
 
-    faces_by_material = {}
-    for polygon in me.polygons:
-        if not polygon.material_index in faces_by_material:
-            faces_by_material[polygon.material_index] = []   
-        faces_by_material[polygon.material_index].append(polygon)
+    co = np.zeros(len(me.vertices) * 3, dtype=np.float32)
+    me.vertices.foreach_get("co", co)
+    co = co.reshape(-1, 3)
+
+    loop_verts = np.zeros(num_loops, dtype=np.int32)
+    me.loops.foreach_get("vertex_index", loop_verts)
+
+    uv_maps = []
+    for layer in me.uv_layers:
+        uv = np.zeros(num_loops * 2, dtype=np.float32)
+        layer.data.foreach_get("uv", uv)
+        uv_maps.append(uv.reshape(-1, 2))
+
+    loop_colors = {}
+    for name in ["color0", "color1"]:
+        if name in me.vertex_colors:
+            color = np.zeros(num_loops * 4, dtype=np.float32)
+            me.vertex_colors[name].data.foreach_get("color", color)
+            loop_colors[name] = color.reshape(-1, 4)
+
+    tangents = np.zeros(num_loops * 3, dtype=np.float32)
+    me.loops.foreach_get("tangent", tangents)
+    tangents = tangents.reshape(-1, 3)
+    bitangent_signs = np.zeros(num_loops, dtype=np.float32)
+    me.loops.foreach_get("bitangent_sign", bitangent_signs)
+
+    # mesh is triangulated, so every polygon has 3 loops
+    num_polys = len(me.polygons)
+    loop_starts = np.zeros(num_polys, dtype=np.int32)
+    me.polygons.foreach_get("loop_start", loop_starts)
+    material_indices = np.zeros(num_polys, dtype=np.int32)
+    me.polygons.foreach_get("material_index", material_indices)
+
+    # materials in the order they're first used
+    used_materials, first_use = np.unique(material_indices, return_index=True)
+    used_materials = used_materials[np.argsort(first_use)]
+    faces_by_material = {int(m): np.flatnonzero(material_indices == m) for m in used_materials}
 
     for index in faces_by_material:
         print(f"Faces_by_material[{index}]: {len(faces_by_material[index])}")
@@ -129,7 +156,7 @@ def export_one(fullpath, extract_dir, obj, flip_uv_vertical):
             print(f"Asked for material index: {mat_index} but we only have {len(obj.material_slots)}. Won't do anything with {len(faces_by_material[mat_index])} triangles I guess")
             continue
 
-        thisSPS = swg_types.SPS(this_mat_index, f'shader/{material.name}.sht', 0, [], [])
+        thisSPS = swg_types.SPS(this_mat_index, f'shader/{material.name}.sht', 0, None, [])
         this_mat_index += 1
 
         uvSets = 1
@@ -156,60 +183,41 @@ def export_one(fullpath, extract_dir, obj, flip_uv_vertical):
             thisSPS.flags = vertex_buffer_format.setNumberOfTextureCoordinateSets(thisSPS.flags, uv_dim)
             thisSPS.flags = vertex_buffer_format.setTextureCoordinateSetDimension(thisSPS.flags, uv_dim - 1, 4)
 
-        unique_verts={}
-        last_unique_vert_index=0
-        for face_index, face in enumerate(face_list):
-
-            p1 = p2 = p3 = None
-            for uv_index, l_index in enumerate(face.loop_indices):
-                v = me.vertices[face.vertices[uv_index]]
-                normal = normals[l_index]
-
-                test_uv = uv_maps[0][l_index].uv.copy()
-                rounded = face.vertices[uv_index], veckey2d(normal, test_uv)
-                if rounded not in unique_verts:
-                    unique_verts[rounded] = last_unique_vert_index
-                    last_unique_vert_index += 1
-
-                    swg_v = swg_types.SWGVertex()
-                    swg_v.pos = Vector(support.convert_vector3(v.co))
-                    swg_v.normal = Vector(support.convert_vector3(normal))
-
-                    if doColor0:
-                        swg_v.color0 = me.vertex_colors["color0"].data[l_index].color                        
-
-                    if doColor1:
-                        swg_v.color1 = me.vertex_colors["color1"].data[l_index].color
-
-                    for i in range(0, uvSets):
-                        uv = me.uv_layers[i].data[l_index].uv.copy()
-
-                        if flip_uv_vertical:
-                            uv[1] = (1.0 - uv[1])
-
-                        swg_v.texs.append(uv)
-                        #if abs(uv[0]) > 10 or abs(uv[1]) > 10:
-                        #print(f"SPS {this_mat_index-1} Vert {v.index} UV: {i} = {uv}")
-
-                    if doDOT3:
-                        loop = me.loops[l_index]                        
-                        tang = support.convert_vector3(loop.tangent)
-                        swg_v.texs.append([ *tang, loop.bitangent_sign])
-
-                    thisSPS.verts.append(swg_v)
-                    total_verts += 1
-
-                if p1 == None:
-                    p1 = unique_verts[rounded]
-                elif p2 == None:
-                    p2 = unique_verts[rounded]
-                elif p3 == None:
-                    p3 = unique_verts[rounded]
-                    thisSPS.tris.append(swg_types.Triangle(p3, p2, p1))
-                    total_tris += 1
-                    p1 = p2 = p3 = None        
+        # Weld loops that share a vertex, normal and first UV (rounded to 4
+        # places). Unique verts are numbered in the order they're first seen
+        loops = (loop_starts[face_list][:, None] + np.arange(3)).ravel()
+        keys = np.column_stack([loop_verts[loops], np.round(normals[loops], 4), np.round(uv_maps[0][loops], 4)]) + 0.0
+        _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+        order = np.argsort(first)
+        remap = np.empty_like(order)
+        remap[order] = np.arange(len(order))
+        source_loops = loops[first[order]]
+
+        thisSPS.vertex_count = len(source_loops)
+        thisSPS.positions = co[loop_verts[source_loops]][:, [0, 2, 1]]
+        thisSPS.normals = normals[source_loops][:, [0, 2, 1]]
+        if doColor0:
+            thisSPS.colors0 = loop_colors["color0"][source_loops]
+        if doColor1:
+            thisSPS.colors1 = loop_colors["color1"][source_loops]
+        for i in range(0, uvSets):
+            uv = uv_maps[i][source_loops].astype(np.float64)
+            if flip_uv_vertical:
+                uv[:, 1] = 1.0 - uv[:, 1]
+            thisSPS.uvs.append(uv.astype(np.float32))
+        if doDOT3:
+            thisSPS.dot3 = np.column_stack([tangents[source_loops][:, [0, 2, 1]], bitangent_signs[source_loops]])
+
+        # SWG winds the other way, so each triangle is (p3, p2, p1)
+        thisSPS.tris = remap[inverse.reshape(-1)].reshape(-1, 3)[:, ::-1]
+        if optimize_vertex_cache:
+            triangle_order, vertex_order, tris = vertex_cache.optimize(thisSPS.indices, thisSPS.vertex_count, f"SPS {thisSPS.no}")
+            thisSPS.reorder_vertices(vertex_order)
+            thisSPS.tris = tris
+        total_verts += thisSPS.vertex_count
+        total_tris += len(face_list)
             
-        print(f"SPS {str(thisSPS.no)}: Unique Verts: {str(len(unique_verts))} UV Channels: {str(vertex_buffer_format.getNumberOfTextureCoordinateSets(thisSPS.flags))} Has flags {str(thisSPS.flags)}") 
+        print(f"SPS {str(thisSPS.no)}: Unique Verts: {str(thisSPS.vertex_count)} UV Channels: {str(vertex_buffer_format.getNumberOfTextureCoordinateSets(thisSPS.flags))} Has flags {str(thisSPS.flags)}") 
         newMsh.spss.append(thisSPS)     
         this_mat_index += 1
 
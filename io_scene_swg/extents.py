@@ -64,8 +64,8 @@ class BoxExtents(Extents):
         iff.exitForm("EXSP")
 
         iff.enterChunk("BOX ")
-        min = vector3D.Vector3D(iff.read_float(), iff.read_float(), iff.read_float())
         max = vector3D.Vector3D(iff.read_float(), iff.read_float(), iff.read_float())
+        min = vector3D.Vector3D(iff.read_float(), iff.read_float(), iff.read_float())
         #print(f"Min: {min} Max: {max}")
         iff.exitChunk("BOX ")
         iff.exitForm("0001")
@@ -42,7 +42,9 @@ def load_new(context,
              flip_uv_vertical=False,
              remove_duplicate_verts=True,
              do_floor=True,
-             do_collision=True
+             do_collision=True,
+             preconvert_textures=True,
+             defer_materials=False
              ):  
 
     s=context.preferences.addons[__package__].preferences.swg_root
@@ -89,6 +91,9 @@ def load_new(context,
         support.add_rtw_mesh(rtw, lodFile.writeshape, "Write")
 
 
+    if preconvert_textures and not defer_materials:
+        support.preconvert_shader_textures(support.appearance_shaders(filepath, s), s)
+
     for id, lod in lodFile.lods.items():
         lod[2] = os.path.join("appearance",lod[2])
         file = support.find_file(lod[2], s)
@@ -97,7 +102,8 @@ def load_new(context,
             continue
         elif file.endswith(".msh"):
             print(f"Importing mesh: {lod[2]} from {file}")
-            obj = import_msh.import_msh(context, file, lods, flip_uv_vertical, remove_duplicate_verts, True)
+            obj = import_msh.import_msh(context, file, lods, flip_uv_vertical, remove_duplicate_verts, True,
+                                        defer_materials=defer_materials, preconvert_textures=False)
             obj['distance'] = lod[1]
         else:
             print(f"Unhandled LOD Child type: {file}")
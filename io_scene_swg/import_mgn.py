@@ -20,6 +20,7 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 import bpy, base64
+import numpy as np
 from . import swg_types
 from . import support
 from bpy.props import *
@@ -30,34 +31,31 @@ import math
 def import_mgn( context, 
                 filepath, 
                 *,      
-                global_matrix=None):
+                global_matrix=None,
+                defer_materials=False):
 
     s=context.preferences.addons[__package__].preferences.swg_root
     #s="E:/SWG_Legends_Dev/clientside_git_repo/"
 
     mgn = swg_types.SWGMgn(filepath, s)
     mgn.load()
+    if not defer_materials:
+        support.preconvert_shader_textures([psdt.real_shader for psdt in mgn.psdts], s)
 
     mesh_name = filepath.split('\\')[-1].split('.')[0]
     mesh = bpy.data.meshes.new(mesh_name)
         
     edges=[]
-    blender_verts = []
-    blender_norms = []
-    for v in mgn.positions:
-        blender_verts.append([v[0],v[1],v[2]])
-
-    for n in mgn.normals:
-        blender_norms.append([n[0],n[1],-n[2]])
+    blender_verts = mgn.positions.tolist()
+    blender_norms = mgn.normals * [1, 1, -1]
     
     scene_object = bpy.data.objects.new(mesh_name, mesh)
     context.collection.objects.link(scene_object)
 
-    faces_by_material=[]
     normals=[]
     tris = []
-    tris_flat = []
-    uvs_flat = []
+    material_indices = []
+    uvs_flat = {}
     for pid, psdt in enumerate(mgn.psdts):
         # mat = bpy.data.materials.new(psdt.stripped_shader_name())
         # mesh.materials.append(mat)  
@@ -71,43 +69,32 @@ def import_mgn( context,
         if material == None:
             material = bpy.data.materials.new(psdt.stripped_shader_name()) 
         if psdt.real_shader: 
-           support.configure_material_from_swg_shader(material, psdt.real_shader, s) 
+           support.set_up_material(material, psdt.real_shader, s, defer_materials) 
 
         mesh.materials.append(material)
 
-        faces_by_material.append([])
-
+        pidx = np.asarray(psdt.pidx, dtype=np.int64)
+        nidx = np.asarray(psdt.nidx, dtype=np.int64)
         for prim in psdt.prims:
-            for tri in prim:
-                p1 = psdt.pidx[tri.p3]
-                p2 = psdt.pidx[tri.p2]
-                p3 = psdt.pidx[tri.p1]
-                
-                normals.append(blender_norms[psdt.nidx[tri.p3]])
-                normals.append(blender_norms[psdt.nidx[tri.p2]])
-                normals.append(blender_norms[psdt.nidx[tri.p1]])
-
-                tris_flat.append(p1)
-                tris_flat.append(p2)
-                tris_flat.append(p3)
-                tris.append([p1, p2, p3])
-                faces_by_material[pid].append((p1, p2, p3))
-
-
-                for uv_layer_num in range(0, psdt.num_uvs):                    
-                    if psdt.uv_dimensions[uv_layer_num] != 2:
-                        print(f"*** Warning *** Not handling UV layer {uv_layer_num} with dimension: {psdt.uv_dimensions[uv_layer_num]}")
-                        continue 
-                    if len(uvs_flat) <= uv_layer_num:
-                        uvs_flat.append([])
-                    
-                    uvs_flat[uv_layer_num].append(psdt.uvs[uv_layer_num][tri.p3])
-                    uvs_flat[uv_layer_num].append(psdt.uvs[uv_layer_num][tri.p2])
-                    uvs_flat[uv_layer_num].append(psdt.uvs[uv_layer_num][tri.p1])
-
-    mesh.from_pydata(blender_verts, edges, tris)
+            # SWG winding is reversed relative to Blender
+            corners = np.array([(tri.p3, tri.p2, tri.p1) for tri in prim], dtype=np.int64).reshape(-1, 3)
+            tris.append(pidx[corners])
+            normals.append(blender_norms[nidx[corners]].reshape(-1, 3))
+            material_indices.append(np.full(len(corners), pid, dtype=np.int32))
+
+            for uv_layer_num in range(0, psdt.num_uvs):                    
+                if psdt.uv_dimensions[uv_layer_num] != 2:
+                    print(f"*** Warning *** Not handling UV layer {uv_layer_num} with dimension: {psdt.uv_dimensions[uv_layer_num]}")
+                    continue 
+                uvs_flat.setdefault(uv_layer_num, []).append(psdt.uvs[uv_layer_num][corners].reshape(-1, 2))
+
+    tris = np.concatenate(tris) if len(tris) > 0 else np.zeros((0, 3), dtype=np.int64)
+    num_loops = len(tris) * 3
+
+    mesh.from_pydata(blender_verts, edges, tris.tolist())
     mesh.use_auto_smooth = True
-    mesh.normals_split_custom_set(normals)
+    if len(normals) > 0:
+        mesh.normals_split_custom_set(np.concatenate(normals))
     mesh.transform(global_matrix)
     
     if mgn.occlusion_zones:
@@ -115,48 +102,49 @@ def import_mgn( context,
             face_map = scene_object.face_maps.new(name=ozc[0])
             face_map.add(ozc[1])   
 
-    for flist in mesh.polygons: 
-        for id, face_list in enumerate(faces_by_material):
-            if flist.vertices[:] in face_list:
-                flist.material_index = id
+    if len(material_indices) > 0:
+        mesh.polygons.foreach_set("material_index", np.concatenate(material_indices))
 
-    for i, uvs in enumerate(uvs_flat):
-        print(f'UV Layer: {i} -- lengths of UVs ({len(uvs)}) and Tri indecies ({len(tris_flat)})')
-        if len(uvs) != len(tris_flat):
-            print(f'*** WARNING *** UV Layer: {i} -- Unmatched lengths of UVs ({len(uvs)}) and Tri indecies ({len(tris_flat)}). Skipping!')
+    for i, uv_layer_num in enumerate(sorted(uvs_flat)):
+        uvs = np.concatenate(uvs_flat[uv_layer_num])
+        print(f'UV Layer: {i} -- lengths of UVs ({len(uvs)}) and Tri indecies ({num_loops})')
+        if len(uvs) != num_loops:
+            print(f'*** WARNING *** UV Layer: {i} -- Unmatched lengths of UVs ({len(uvs)}) and Tri indecies ({num_loops}). Skipping!')
             continue
 
         uvlayer = mesh.uv_layers.new(name=f'UVMap-{str(i)}')
         mesh.uv_layers.active = uvlayer
         
         print(f"Adding uv layer with size: {str(len(uvlayer.data))} for mesh with {str(len(mesh.polygons))} tris")
-        for ind, vert in enumerate(tris_flat):
-            try:
-                uv = [uvs[ind][0], 1 - uvs[ind][1]]
-                uvlayer.data[ind].uv = uv
-            except Exception as e:
-                print(f"Exception importing UVs: " + str(e))
+        uvs = np.array(uvs, dtype=np.float32)
+        uvs[:, 1] = 1 - uvs[:, 1]
+        uvlayer.data.foreach_set("uv", uvs.ravel())
     vgs = {}
     for i, bone in enumerate(mgn.bone_names):
         vg = scene_object.vertex_groups.new(name=bone)
         vgs[i] = vg
 
-    for i, vertex_weights in enumerate(mgn.vertex_weights):
-        sum=0
-        for weight in vertex_weights:
-            #if sum + weight[1] > 1.0:
-            #    weight[1] = (1.0 - sum)
-            #    print(f"Capped bone weight contribution of: {i} {weight[0]} to {weight[1]}!")
-            vgs[weight[0]].add([i], weight[1], 'ADD')
+    # One add per bone and weight value rather than per vertex
+    for bone, weight, verts in mgn.get_weight_groups():
+        vgs[bone].add(verts.tolist(), weight, 'ADD')
     
     scene_object.shape_key_add(name='Basis')
+    if len(mgn.blends) > 0:
+        basis = np.zeros(len(mesh.vertices) * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", basis)
+        basis = basis.reshape(-1, 3)
+        # Same as global_matrix @ Vector(delta) for each delta, translation included
+        matrix = np.array(global_matrix, dtype=np.float64)
+        rotation = matrix[:3, :3].T
+        translation = matrix[:3, 3] if len(matrix) == 4 else np.zeros(3)
     for i, blend in enumerate(mgn.blends):
         sk = scene_object.shape_key_add(name=blend.name)
-        for vert in blend.positions:
-            id = vert[0]
-            delta = [vert[1][0], vert[1][1], -vert[1][2]]
-            delta_v = Vector(delta)
-            sk.data[id].co = scene_object.data.vertices[id].co + (global_matrix @ delta_v)
+        positions = swg_types.SWGMgn.pack_blend_deltas(blend.positions)
+        indices = positions['index']
+        deltas = (positions['delta'] * [1, 1, -1]) @ rotation + translation
+        co = basis.copy()
+        co[indices] = basis[indices] + deltas
+        sk.data.foreach_set("co", co.ravel())
     
     for i, skel in enumerate(mgn.skeletons):
         scene_object[f'SKTM_{i}'] = skel
@@ -22,6 +22,7 @@
 
 import base64, os, bpy, time, datetime, math
 import bmesh
+import numpy as np
 from mathutils import Matrix, Vector, Color, Quaternion, Euler
 
 from bpy_extras.io_utils import unpack_list
@@ -65,6 +66,8 @@ def import_msh(context,
                flip_uv_vertical=False,
                remove_duplicate_verts=True,
                just_the_mesh = False,
+               defer_materials = False,
+               preconvert_textures = True,
     ):  
 
     print(f'Importing msh: {filepath} Flip UV: {flip_uv_vertical}')
@@ -73,6 +76,8 @@ def import_msh(context,
     msh = swg_types.SWGMesh(filepath, s)
     if not msh.load():
         return {'CANCELLED'}
+    if preconvert_textures and not defer_materials:
+        support.preconvert_shader_textures([sps.real_shader for sps in msh.spss], s)
     
         
     name=os.path.basename(filepath).rsplit( ".", 1 )[ 0 ]
@@ -84,27 +89,21 @@ def import_msh(context,
     
     parent.objects.link(obj)
 
-    faces_by_material = {}
-    materials_by_face_index = []
-    normals=[]
-    verts = []   
+    verts = []
+    faces = []
+    face_materials = []
+    normals = []
     color0 = []
     color1 = []
     uvs_by_depth = {}
 
     highest_vert_ind=0
-    global_loop_index=0
-    
-    any_sps_has_color0 = False
-    any_sps_has_color1 = False
+    num_uv_layers = max([sps.getNumUVSets() for sps in msh.spss], default=0)
+    any_sps_has_color0 = any([sps.hasColor0() for sps in msh.spss])
+    any_sps_has_color1 = any([sps.hasColor1() for sps in msh.spss])
     for index, sps in enumerate(msh.spss):
         
         num_uv_sets = sps.getNumUVSets()
-        for i in range(0, num_uv_sets):
-            if i not in uvs_by_depth.keys():
-                uvs_by_depth[i] = {}
-
-        faces_by_material[index] = []
         mat_name = sps.stripped_shader_name()
         material = None
         
@@ -121,91 +120,67 @@ def import_msh(context,
         material["Color1"] = sps.hasColor1()
 
         if sps.real_shader: 
-           support.configure_material_from_swg_shader(material, sps.real_shader, s) 
+           support.set_up_material(material, sps.real_shader, s, defer_materials) 
 
         mesh.materials.append(material)        
 
-        uvs = []
-        for ind, vert in enumerate(sps.verts):
-            verts.append(support.convert_vector3(vert.pos))
-            
-            
-        for tri in sps.tris:
-            p3 = tri.p3 + highest_vert_ind
-            p2 = tri.p2 + highest_vert_ind
-            p1 = tri.p1 + highest_vert_ind
-            faces_by_material[index].append((p3, p2, p1))
-            p3n = sps.verts[tri.p3].normal
-            p2n = sps.verts[tri.p2].normal
-            p1n = sps.verts[tri.p1].normal           
-            normals.append(support.convert_vector3([p3n.x, p3n.y, p3n.z]))
-            normals.append(support.convert_vector3([p2n.x, p2n.y, p2n.z]))
-            normals.append(support.convert_vector3([p1n.x, p1n.y, p1n.z]))
-
-            for loop_index, vert_index in enumerate([tri.p3, tri.p2, tri.p1]):
-                vert = sps.verts[vert_index]
-
-                if sps.hasColor0():
-                    any_sps_has_color0 = True
-                    color0.append(vert.color0)
-                else:
-                    color0.append([1,1,1,1])
-                    
-                if sps.hasColor1():
-                    any_sps_has_color1 = True
-                    color1.append(vert.color1)
-                else:
-                    color1.append([1,1,1,1])
-
-
-                for uvi in range(0, num_uv_sets):
-                    uv = vert.texs[uvi] 
-                    uvs_by_depth[uvi][global_loop_index] = uv
-                    #print(f"SPS {index}, Vert {global_loop_index} UV: {uvi} = {Vector(uv)}")
-
-                global_loop_index += 1
-
-            materials_by_face_index.append(index)
-        highest_vert_ind += len(sps.verts)
-    mesh.from_pydata(verts, [], sum(faces_by_material.values(), []))
-
-    for flist in mesh.polygons:
-        flist.material_index = materials_by_face_index[flist.index]
-
-    mesh.use_auto_smooth = True
-    mesh.normals_split_custom_set(normals) 
+        # SWG winds the other way, so each face is (p3, p2, p1)
+        tris = sps.get_indices()[:, ::-1]
+        loop_verts = tris.ravel()
+
+        # convert_vector3 for whole arrays: swap y and z
+        verts.append(sps.positions[:, [0, 2, 1]])
+        faces.append(tris + highest_vert_ind)
+        face_materials.append(np.full(len(tris), index, dtype=np.int32))
+        normals.append(sps.normals[loop_verts][:, [0, 2, 1]])
+
+        white = np.ones((len(loop_verts), 4), dtype=np.float32)
+        color0.append(sps.colors0[loop_verts] if sps.hasColor0() else white)
+        color1.append(sps.colors1[loop_verts] if sps.hasColor1() else white)
+
+        for uvi in range(0, num_uv_layers):
+            # loops of SPSs without this uv set are left at (0, 0)
+            uv = np.zeros((len(loop_verts), 2), dtype=np.float32)
+            if uvi < num_uv_sets:
+                sps_uv = sps.uvs[uvi][loop_verts]
+                dim = min(2, sps_uv.shape[1])
+                uv[:, 0:dim] = sps_uv[:, 0:dim]
+                if flip_uv_vertical:
+                    uv[:, 1] = 1.0 - uv[:, 1]
+            uvs_by_depth.setdefault(uvi, []).append(uv)
+
+        highest_vert_ind += sps.get_vertex_count()
+
+    verts = np.concatenate(verts) if len(verts) > 0 else np.zeros((0, 3), dtype=np.float32)
+    faces = np.concatenate(faces) if len(faces) > 0 else np.zeros((0, 3), dtype=np.int64)
+    num_loops = faces.size
+
+    mesh.vertices.add(len(verts))
+    mesh.vertices.foreach_set("co", verts.astype(np.float32).ravel())
+    mesh.loops.add(num_loops)
+    mesh.loops.foreach_set("vertex_index", faces.astype(np.int32).ravel())
+    mesh.polygons.add(len(faces))
+    mesh.polygons.foreach_set("loop_start", np.arange(0, num_loops, 3, dtype=np.int32))
+    mesh.polygons.foreach_set("loop_total", np.full(len(faces), 3, dtype=np.int32))
+    if len(face_materials) > 0:
+        mesh.polygons.foreach_set("material_index", np.concatenate(face_materials))
+    mesh.update(calc_edges=True)
+
+    if len(normals) > 0:
+        mesh.use_auto_smooth = True
+        mesh.normals_split_custom_set(np.concatenate(normals))
     
     for depth, uvs in uvs_by_depth.items():        
         uv_layer = mesh.uv_layers.new(name=f'uvmap-{depth}')
-        for loop in mesh.loops:
-            try:
-                uv_layer.data[loop.index].uv = [0.0,0.0]
-            except:
-                print(f"*** UVMap: {uv_layer.name} Couldn't default loop: {loop.index}")
-
-        for loop_index, uv in uvs.items():
-            uv_layer.data[loop_index].uv = [uv[0], (uv[1] if not flip_uv_vertical else (1.0 - uv[1]))]
-
-    
+        uv_layer.data.foreach_set("uv", np.concatenate(uvs).ravel())
 
     if any_sps_has_color0:
-        mesh.vertex_colors.new(name="color0")
-        color_layer = mesh.vertex_colors["color0"]
-        try:
-            for idx in range(0, len(color0)):
-                color_layer.data[idx].color = color0[idx]
-                c=color_layer.data[idx].color
-        except:
-            print(f"Warning! Color0 only has {len(color0)} but need {len(color_layer.data)}")
+        color_layer = mesh.vertex_colors.new(name="color0")
+        color_layer.data.foreach_set("color", np.concatenate(color0).astype(np.float32).ravel())
 
     if any_sps_has_color1:
-        mesh.vertex_colors.new(name="color1")
-        color_layer = mesh.vertex_colors["color1"]
-        try:
-            for idx in range(0, len(color1)):
-                color_layer.data[idx].color = color1[idx] 
-        except:
-            print(f"Warning! Color1 only has {len(color1)} but need {len(color_layer.data)}")
+        color_layer = mesh.vertex_colors.new(name="color1")
+        color_layer.data.foreach_set("color", np.concatenate(color1).astype(np.float32).ravel())
 
     if remove_duplicate_verts:
         #print(f"Removing duplicate verts ...")
@@ -233,7 +208,8 @@ def load_new(context,
              global_matrix=None,
              flip_uv_vertical=False,
              remove_duplicate_verts=True,
+             defer_materials=False,
              ):  
 
-    obj = import_msh(context, filepath, None, flip_uv_vertical, remove_duplicate_verts)
+    obj = import_msh(context, filepath, None, flip_uv_vertical, remove_duplicate_verts, defer_materials=defer_materials)
     return {'FINISHED'}
\ No newline at end of file
@@ -38,7 +38,8 @@ def load_new(context,
              filepath,
              *,
              flip_uv_vertical=False,
-             remove_duplicate_verts=True
+             remove_duplicate_verts=True,
+             defer_materials=False
              ):  
 
     SWG_ROOT=context.preferences.addons[__package__].preferences.swg_root
@@ -53,6 +54,15 @@ def load_new(context,
     if pob.crc != None:
         collection['crc'] = pob.crc
 
+    # every cell's textures in one parallel batch rather than mesh by mesh
+    if not defer_materials:
+        shaders = []
+        for cell in pob.cells:
+            appearance_path = support.find_file(cell.appearance_file, SWG_ROOT)
+            if appearance_path:
+                shaders += support.appearance_shaders(appearance_path, SWG_ROOT)
+        support.preconvert_shader_textures(shaders, SWG_ROOT)
+
     portal_objs={}
     for cell in pob.cells:            
         cell_collection = bpy.data.collections.new(cell.name)
@@ -67,6 +77,8 @@ def load_new(context,
             parent=cell_collection,
             flip_uv_vertical=flip_uv_vertical,
             remove_duplicate_verts=remove_duplicate_verts,
+            defer_materials=defer_materials,
+            preconvert_textures=False,
             )
             mesh.name = f'Appearance_{cell.name}'
         elif appearance_path and appearance_path.endswith(".lod"):
@@ -76,7 +88,9 @@ def load_new(context,
                 flip_uv_vertical=flip_uv_vertical,
                 remove_duplicate_verts=remove_duplicate_verts,
                 do_collision=False,
-                do_floor=False
+                do_floor=False,
+                preconvert_textures=False,
+                defer_materials=defer_materials
                 )
             if result[0] == 'SUCCESS':
                 result[1].name = f'Appearance_{cell.name}'
@@ -95,6 +109,8 @@ def load_new(context,
                 parent=cell_collection,
                 flip_uv_vertical=flip_uv_vertical,
                 remove_duplicate_verts=False,
+                defer_materials=defer_materials,
+                preconvert_textures=False,
                 )
                 mesh.name = f'Appearance_{cell.name}'
             elif referenceFilePath and referenceFilePath.endswith(".lod"):
@@ -104,7 +120,9 @@ def load_new(context,
                     flip_uv_vertical=flip_uv_vertical,
                     remove_duplicate_verts=remove_duplicate_verts,
                     do_collision=False,
-                    do_floor=False
+                    do_floor=False,
+                    preconvert_textures=False,
+                    defer_materials=defer_materials
                     )
                 if result[0] == 'SUCCESS':
                     result[1].name = f'Appearance_{cell.name}'
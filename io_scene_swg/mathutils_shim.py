@@ -0,0 +1,184 @@
+# MIT License
+#
+# Copyright (c) 2022 Nick Rafalski
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# A small NumPy stand-in for the parts of Blender's mathutils that the file
+# format code uses, so swg_types can run outside Blender (see cli.py).
+
+import sys
+import types
+import numpy as np
+
+
+class Vector(np.ndarray):
+    def __new__(cls, seq=(0.0, 0.0, 0.0)):
+        return np.array(seq, dtype=np.float64).reshape(-1).view(cls)
+
+    def __eq__(self, other):
+        if other is None:
+            return False
+        other = np.asarray(other, dtype=np.float64)
+        return self.shape == other.shape and bool(np.all(np.asarray(self) == other))
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Vector(({', '.join(f'{v:.4f}' for v in self)}))"
+
+    @property
+    def x(self):
+        return float(self[0])
+
+    @x.setter
+    def x(self, value):
+        self[0] = value
+
+    @property
+    def y(self):
+        return float(self[1])
+
+    @y.setter
+    def y(self, value):
+        self[1] = value
+
+    @property
+    def z(self):
+        return float(self[2])
+
+    @z.setter
+    def z(self, value):
+        self[2] = value
+
+    @property
+    def length(self):
+        return float(np.linalg.norm(self))
+
+    magnitude = length
+
+    @property
+    def length_squared(self):
+        return float(np.dot(self, self))
+
+    def dot(self, other):
+        return float(np.dot(self, other))
+
+    def cross(self, other):
+        return Vector(np.cross(self, other))
+
+    def normalized(self):
+        length = self.length
+        return Vector(self / length) if length > 0.0 else Vector(np.zeros(len(self)))
+
+    def normalize(self):
+        self[:] = self.normalized()
+
+    def to_tuple(self):
+        return tuple(float(v) for v in self)
+
+    def copy(self):
+        return Vector(self)
+
+
+class Matrix(np.ndarray):
+    def __new__(cls, rows=None):
+        if rows is None:
+            rows = np.identity(4)
+        return np.array(rows, dtype=np.float64).view(cls)
+
+    @classmethod
+    def Identity(cls, size):
+        return cls(np.identity(size))
+
+    @classmethod
+    def Translation(cls, vector):
+        m = np.identity(4)
+        m[:3, 3] = vector
+        return cls(m)
+
+    def __matmul__(self, other):
+        other = np.asarray(other, dtype=np.float64)
+        if other.ndim == 1 and len(other) == 3 and self.shape == (4, 4):
+            return Vector((np.asarray(self) @ np.append(other, 1.0))[:3])
+        result = np.asarray(self) @ other
+        return Vector(result) if result.ndim == 1 else Matrix(result)
+
+    def inverted(self):
+        return Matrix(np.linalg.inv(self))
+
+    def transposed(self):
+        return Matrix(np.asarray(self).T)
+
+    def to_3x3(self):
+        return Matrix(np.asarray(self)[:3, :3])
+
+    def to_translation(self):
+        return Vector(np.asarray(self)[:3, 3])
+
+
+def intersect_point_tri(pt, tri_p1, tri_p2, tri_p3):
+    # Projects pt onto the triangle's plane; None when it falls outside the triangle.
+    pt, a, b, c = (np.asarray(v, dtype=np.float64) for v in (pt, tri_p1, tri_p2, tri_p3))
+    normal = np.cross(b - a, c - a)
+    area = np.dot(normal, normal)
+    if area == 0.0:
+        return None
+    projected = pt - (np.dot(pt - a, normal) / area) * normal
+    for p, q in ((a, b), (b, c), (c, a)):
+        if np.dot(np.cross(q - p, projected - p), normal) < 0.0:
+            return None
+    return Vector(projected)
+
+
+def intersect_line_line(v1, v2, v3, v4):
+    # Closest points between the infinite lines v1-v2 and v3-v4; None when parallel.
+    p1, p2, p3, p4 = (np.asarray(v, dtype=np.float64) for v in (v1, v2, v3, v4))
+    d1 = p2 - p1
+    d2 = p4 - p3
+    r = p1 - p3
+    a = np.dot(d1, d1)
+    e = np.dot(d2, d2)
+    b = np.dot(d1, d2)
+    denom = a * e - b * b
+    if denom <= 1e-12 * a * e:
+        return None
+    c = np.dot(d1, r)
+    f = np.dot(d2, r)
+    s = (b * f - c * e) / denom
+    t = (a * f - b * c) / denom
+    return (Vector(p1 + s * d1), Vector(p3 + t * d2))
+
+
+geometry = types.ModuleType("mathutils.geometry")
+geometry.intersect_point_tri = intersect_point_tri
+geometry.intersect_line_line = intersect_line_line
+
+
+def install():
+    """Registers this module as `mathutils` unless Blender's own is importable."""
+    try:
+        import mathutils
+    except ImportError:
+        sys.modules["mathutils"] = sys.modules[__name__]
+        sys.modules["mathutils.geometry"] = geometry
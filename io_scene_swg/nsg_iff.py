@@ -1,9 +1,44 @@
-import struct, io, builtins, os, sys
+import struct, io, builtins, os, sys, mmap
 import time
 import datetime
 import numpy 
 
 timesExpanded = 0
+CRC_TABLE = [
+    0x00000000, 0x04C11DB7, 0x09823B6E, 0x0D4326D9, 0x130476DC, 0x17C56B6B, 0x1A864DB2, 0x1E475005,
+    0x2608EDB8, 0x22C9F00F, 0x2F8AD6D6, 0x2B4BCB61, 0x350C9B64, 0x31CD86D3, 0x3C8EA00A, 0x384FBDBD,
+    0x4C11DB70, 0x48D0C6C7, 0x4593E01E, 0x4152FDA9, 0x5F15ADAC, 0x5BD4B01B, 0x569796C2, 0x52568B75,
+    0x6A1936C8, 0x6ED82B7F, 0x639B0DA6, 0x675A1011, 0x791D4014, 0x7DDC5DA3, 0x709F7B7A, 0x745E66CD,
+    0x9823B6E0, 0x9CE2AB57, 0x91A18D8E, 0x95609039, 0x8B27C03C, 0x8FE6DD8B, 0x82A5FB52, 0x8664E6E5,
+    0xBE2B5B58, 0xBAEA46EF, 0xB7A96036, 0xB3687D81, 0xAD2F2D84, 0xA9EE3033, 0xA4AD16EA, 0xA06C0B5D,
+    0xD4326D90, 0xD0F37027, 0xDDB056FE, 0xD9714B49, 0xC7361B4C, 0xC3F706FB, 0xCEB42022, 0xCA753D95,
+    0xF23A8028, 0xF6FB9D9F, 0xFBB8BB46, 0xFF79A6F1, 0xE13EF6F4, 0xE5FFEB43, 0xE8BCCD9A, 0xEC7DD02D,
+    0x34867077, 0x30476DC0, 0x3D044B19, 0x39C556AE, 0x278206AB, 0x23431B1C, 0x2E003DC5, 0x2AC12072,
+    0x128E9DCF, 0x164F8078, 0x1B0CA6A1, 0x1FCDBB16, 0x018AEB13, 0x054BF6A4, 0x0808D07D, 0x0CC9CDCA,
+    0x7897AB07, 0x7C56B6B0, 0x71159069, 0x75D48DDE, 0x6B93DDDB, 0x6F52C06C, 0x6211E6B5, 0x66D0FB02,
+    0x5E9F46BF, 0x5A5E5B08, 0x571D7DD1, 0x53DC6066, 0x4D9B3063, 0x495A2DD4, 0x44190B0D, 0x40D816BA,
+    0xACA5C697, 0xA864DB20, 0xA527FDF9, 0xA1E6E04E, 0xBFA1B04B, 0xBB60ADFC, 0xB6238B25, 0xB2E29692,
+    0x8AAD2B2F, 0x8E6C3698, 0x832F1041, 0x87EE0DF6, 0x99A95DF3, 0x9D684044, 0x902B669D, 0x94EA7B2A,
+    0xE0B41DE7, 0xE4750050, 0xE9362689, 0xEDF73B3E, 0xF3B06B3B, 0xF771768C, 0xFA325055, 0xFEF34DE2,
+    0xC6BCF05F, 0xC27DEDE8, 0xCF3ECB31, 0xCBFFD686, 0xD5B88683, 0xD1799B34, 0xDC3ABDED, 0xD8FBA05A,
+    0x690CE0EE, 0x6DCDFD59, 0x608EDB80, 0x644FC637, 0x7A089632, 0x7EC98B85, 0x738AAD5C, 0x774BB0EB,
+    0x4F040D56, 0x4BC510E1, 0x46863638, 0x42472B8F, 0x5C007B8A, 0x58C1663D, 0x558240E4, 0x51435D53,
+    0x251D3B9E, 0x21DC2629, 0x2C9F00F0, 0x285E1D47, 0x36194D42, 0x32D850F5, 0x3F9B762C, 0x3B5A6B9B,
+    0x0315D626, 0x07D4CB91, 0x0A97ED48, 0x0E56F0FF, 0x1011A0FA, 0x14D0BD4D, 0x19939B94, 0x1D528623,
+    0xF12F560E, 0xF5EE4BB9, 0xF8AD6D60, 0xFC6C70D7, 0xE22B20D2, 0xE6EA3D65, 0xEBA91BBC, 0xEF68060B,
+    0xD727BBB6, 0xD3E6A601, 0xDEA580D8, 0xDA649D6F, 0xC423CD6A, 0xC0E2D0DD, 0xCDA1F604, 0xC960EBB3,
+    0xBD3E8D7E, 0xB9FF90C9, 0xB4BCB610, 0xB07DABA7, 0xAE3AFBA2, 0xAAFBE615, 0xA7B8C0CC, 0xA379DD7B,
+    0x9B3660C6, 0x9FF77D71, 0x92B45BA8, 0x9675461F, 0x8832161A, 0x8CF30BAD, 0x81B02D74, 0x857130C3,
+    0x5D8A9099, 0x594B8D2E, 0x5408ABF7, 0x50C9B640, 0x4E8EE645, 0x4A4FFBF2, 0x470CDD2B, 0x43CDC09C,
+    0x7B827D21, 0x7F436096, 0x7200464F, 0x76C15BF8, 0x68860BFD, 0x6C47164A, 0x61043093, 0x65C52D24,
+    0x119B4BE9, 0x155A565E, 0x18197087, 0x1CD86D30, 0x029F3D35, 0x065E2082, 0x0B1D065B, 0x0FDC1BEC,
+    0x3793A651, 0x3352BBE6, 0x3E119D3F, 0x3AD08088, 0x2497D08D, 0x2056CD3A, 0x2D15EBE3, 0x29D4F654,
+    0xC5A92679, 0xC1683BCE, 0xCC2B1D17, 0xC8EA00A0, 0xD6AD50A5, 0xD26C4D12, 0xDF2F6BCB, 0xDBEE767C,
+    0xE3A1CBC1, 0xE760D676, 0xEA23F0AF, 0xEEE2ED18, 0xF0A5BD1D, 0xF464A0AA, 0xF9278673, 0xFDE69BC4,
+    0x89B8FD09, 0x8D79E0BE, 0x803AC667, 0x84FBDBD0, 0x9ABC8BD5, 0x9E7D9662, 0x933EB0BB, 0x97FFAD0C,
+    0xAFB010B1, 0xAB710D06, 0xA6322BDF, 0xA2F33668, 0xBCB4666D, 0xB8757BDA, 0xB5365D03, 0xB1F740B4
+]
+
 class StackFrame():
     def __init__(self, start, length, used):
         self.start = start
@@ -17,19 +52,139 @@ class StackFrame():
         return self.__str__()
 
 
-class IFF():
+class IndexEntry():
+    __slots__ = ('tag', 'isForm', 'offset', 'length', 'depth', 'path')
+    def __init__(self, tag, isForm, offset, length, depth, path):
+        # tag is the FORM name for forms. offset is the start of the block's
+        # header, length is the payload length (for forms excluding the name)
+        self.tag = tag
+        self.isForm = isForm
+        self.offset = offset
+        self.length = length
+        self.depth = depth
+        self.path = path
+
+    @property
+    def dataOffset(self):
+        return self.offset + (12 if self.isForm else 8)
+
+    def __str__(self):
+        return f'{self.path} Offset: {self.offset} Length: {self.length} Depth: {self.depth}'
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class ChunkDataInserter():
+    # Typed helpers shared by the IFF editor and the streaming IFFWriter. They
+    # only rely on insertChunkData() and self.data
 
-    def __init__(self, *, initial_size = 0, filename = ""):
+    def insert_byte(self, b):
+        self.insertChunkData(int.to_bytes(b, 1, byteorder="little", signed=False))
+
+    def insert_bool(self, b):
+        self.insert_byte(1 if b else 0)
+
+    def insertChunkString(self, s, nullTerminate = True):
+        self.insertChunkData(s.encode('ASCII'))
+        if nullTerminate:
+            self.insert_byte(0)
+
+    def insertFloat(self, f):
+        self.insertChunkData(struct.pack('f', f))
+        
+    def insertFloatVector4(self, vec):
+        self.insertFloat(vec[0])
+        self.insertFloat(vec[1])
+        self.insertFloat(vec[2])
+        self.insertFloat(vec[3])
+
+    def insertFloatVector3(self, vec):
+        self.insertFloat(vec[0])
+        self.insertFloat(vec[1])
+        self.insertFloat(vec[2])
+
+    def insertFloatVector2(self, vec):
+        self.insertFloat(vec[0])
+        self.insertFloat(vec[1])
+
+    def insert_int8(self, i):
+        self.insertChunkData(int.to_bytes(i, 1, byteorder="little", signed=True))
+
+    def insert_int16(self, i):
+        self.insertChunkData(int.to_bytes(i, 2, byteorder="little", signed=True))
+
+    def insert_uint16(self, i):
+        self.insertChunkData(int.to_bytes(i, 2, byteorder="little", signed=False))
+
+    def insert_int32(self, i):
+        self.insertChunkData(int.to_bytes(i, 4, byteorder="little", signed=True))    
+
+    def insertInt32Vector3(self, vec):
+        self.insert_int32(vec[0])
+        self.insert_int32(vec[1])
+        self.insert_int32(vec[2])
+
+    def insert_uint32(self, i):
+        self.insertChunkData(int.to_bytes(i, 4, byteorder="little", signed=False))
+
+    def insertArray(self, values, dtype = None):
+        # Writes a whole numpy array, array.array or other buffer in one call.
+        # If dtype is given the values are converted to it first. Either way the
+        # result is little-endian, as everything inside a chunk is
+        if dtype is None and not isinstance(values, numpy.ndarray):
+            values = memoryview(values)
+        arr = numpy.asarray(values, dtype=dtype)
+        arr = numpy.ascontiguousarray(arr, dtype=arr.dtype.newbyteorder('<'))
+        self.insertChunkData(memoryview(arr).cast('B'))
+
+    def insert_color(self, color):
+        r=int(numpy.clip(color[0]*255, 0, 255))
+        g=int(numpy.clip(color[1]*255, 0, 255))
+        b=int(numpy.clip(color[2]*255, 0, 255))
+        a=int(numpy.clip(color[3]*255, 0, 255))
+        
+        # NSG Seems like this should be ARGB per SOE code, but that makes 
+        # the Anchorhead Cantina look gross. Used trial and error to determine
+        # order: BGRA
+        self.insert_byte(b)
+        self.insert_byte(g)
+        self.insert_byte(r)
+        self.insert_byte(a)
+
+    def calculate(self):
+        print(f'Max size: {self.MAXINT}')
+        crc=0xFFFFFFFF
+        for d in self.data:
+            ind = self.int_overflow((crc>>24) ^ d) & 0xFF
+
+            #uind = int.from_bytes(ind.to_bytes(4, 'little', signed=True), 'little', signed=False)
+            temp = (self.crctable[ind] ^ (crc << 8))
+            crc = self.int_overflow(temp)
+            #print(f"{d}: Ind: {ind} Temp: {temp} CRC now {crc}")
+        return crc
+
+    def int_overflow(self, val):
+        if not -self.MAXINT-1 <= val <= self.MAXINT:
+            val = (val + (self.MAXINT + 1)) % (2 * (self.MAXINT + 1)) - self.MAXINT - 1
+        return val
+
+
+class IFF(ChunkDataInserter):
+
+    def __init__(self, *, initial_size = 0, filename = "", use_mmap = False):
         self.inChunk = False
         self.stack = []
         self.length = 0
         self.data = None
+        self.mmap = None
+        self.index = None
         self.stack_depth = 0
         self.in_chunk = False
         self.timesExpanded = 0
         self.filename = filename
         if filename != "":
-            self.open_file(filename)
+            self.open_file(filename, use_mmap = use_mmap)
         else:
             self.length = initial_size
             self.data = bytearray(initial_size)
@@ -38,45 +193,18 @@ class IFF():
             self.stack.append(s)
 
         self.MAXINT= (2**31 - 1)
-        self.crctable = [
-            0x00000000, 0x04C11DB7, 0x09823B6E, 0x0D4326D9, 0x130476DC, 0x17C56B6B, 0x1A864DB2, 0x1E475005,
-            0x2608EDB8, 0x22C9F00F, 0x2F8AD6D6, 0x2B4BCB61, 0x350C9B64, 0x31CD86D3, 0x3C8EA00A, 0x384FBDBD,
-            0x4C11DB70, 0x48D0C6C7, 0x4593E01E, 0x4152FDA9, 0x5F15ADAC, 0x5BD4B01B, 0x569796C2, 0x52568B75,
-            0x6A1936C8, 0x6ED82B7F, 0x639B0DA6, 0x675A1011, 0x791D4014, 0x7DDC5DA3, 0x709F7B7A, 0x745E66CD,
-            0x9823B6E0, 0x9CE2AB57, 0x91A18D8E, 0x95609039, 0x8B27C03C, 0x8FE6DD8B, 0x82A5FB52, 0x8664E6E5,
-            0xBE2B5B58, 0xBAEA46EF, 0xB7A96036, 0xB3687D81, 0xAD2F2D84, 0xA9EE3033, 0xA4AD16EA, 0xA06C0B5D,
-            0xD4326D90, 0xD0F37027, 0xDDB056FE, 0xD9714B49, 0xC7361B4C, 0xC3F706FB, 0xCEB42022, 0xCA753D95,
-            0xF23A8028, 0xF6FB9D9F, 0xFBB8BB46, 0xFF79A6F1, 0xE13EF6F4, 0xE5FFEB43, 0xE8BCCD9A, 0xEC7DD02D,
-            0x34867077, 0x30476DC0, 0x3D044B19, 0x39C556AE, 0x278206AB, 0x23431B1C, 0x2E003DC5, 0x2AC12072,
-            0x128E9DCF, 0x164F8078, 0x1B0CA6A1, 0x1FCDBB16, 0x018AEB13, 0x054BF6A4, 0x0808D07D, 0x0CC9CDCA,
-            0x7897AB07, 0x7C56B6B0, 0x71159069, 0x75D48DDE, 0x6B93DDDB, 0x6F52C06C, 0x6211E6B5, 0x66D0FB02,
-            0x5E9F46BF, 0x5A5E5B08, 0x571D7DD1, 0x53DC6066, 0x4D9B3063, 0x495A2DD4, 0x44190B0D, 0x40D816BA,
-            0xACA5C697, 0xA864DB20, 0xA527FDF9, 0xA1E6E04E, 0xBFA1B04B, 0xBB60ADFC, 0xB6238B25, 0xB2E29692,
-            0x8AAD2B2F, 0x8E6C3698, 0x832F1041, 0x87EE0DF6, 0x99A95DF3, 0x9D684044, 0x902B669D, 0x94EA7B2A,
-            0xE0B41DE7, 0xE4750050, 0xE9362689, 0xEDF73B3E, 0xF3B06B3B, 0xF771768C, 0xFA325055, 0xFEF34DE2,
-            0xC6BCF05F, 0xC27DEDE8, 0xCF3ECB31, 0xCBFFD686, 0xD5B88683, 0xD1799B34, 0xDC3ABDED, 0xD8FBA05A,
-            0x690CE0EE, 0x6DCDFD59, 0x608EDB80, 0x644FC637, 0x7A089632, 0x7EC98B85, 0x738AAD5C, 0x774BB0EB,
-            0x4F040D56, 0x4BC510E1, 0x46863638, 0x42472B8F, 0x5C007B8A, 0x58C1663D, 0x558240E4, 0x51435D53,
-            0x251D3B9E, 0x21DC2629, 0x2C9F00F0, 0x285E1D47, 0x36194D42, 0x32D850F5, 0x3F9B762C, 0x3B5A6B9B,
-            0x0315D626, 0x07D4CB91, 0x0A97ED48, 0x0E56F0FF, 0x1011A0FA, 0x14D0BD4D, 0x19939B94, 0x1D528623,
-            0xF12F560E, 0xF5EE4BB9, 0xF8AD6D60, 0xFC6C70D7, 0xE22B20D2, 0xE6EA3D65, 0xEBA91BBC, 0xEF68060B,
-            0xD727BBB6, 0xD3E6A601, 0xDEA580D8, 0xDA649D6F, 0xC423CD6A, 0xC0E2D0DD, 0xCDA1F604, 0xC960EBB3,
-            0xBD3E8D7E, 0xB9FF90C9, 0xB4BCB610, 0xB07DABA7, 0xAE3AFBA2, 0xAAFBE615, 0xA7B8C0CC, 0xA379DD7B,
-            0x9B3660C6, 0x9FF77D71, 0x92B45BA8, 0x9675461F, 0x8832161A, 0x8CF30BAD, 0x81B02D74, 0x857130C3,
-            0x5D8A9099, 0x594B8D2E, 0x5408ABF7, 0x50C9B640, 0x4E8EE645, 0x4A4FFBF2, 0x470CDD2B, 0x43CDC09C,
-            0x7B827D21, 0x7F436096, 0x7200464F, 0x76C15BF8, 0x68860BFD, 0x6C47164A, 0x61043093, 0x65C52D24,
-            0x119B4BE9, 0x155A565E, 0x18197087, 0x1CD86D30, 0x029F3D35, 0x065E2082, 0x0B1D065B, 0x0FDC1BEC,
-            0x3793A651, 0x3352BBE6, 0x3E119D3F, 0x3AD08088, 0x2497D08D, 0x2056CD3A, 0x2D15EBE3, 0x29D4F654,
-            0xC5A92679, 0xC1683BCE, 0xCC2B1D17, 0xC8EA00A0, 0xD6AD50A5, 0xD26C4D12, 0xDF2F6BCB, 0xDBEE767C,
-            0xE3A1CBC1, 0xE760D676, 0xEA23F0AF, 0xEEE2ED18, 0xF0A5BD1D, 0xF464A0AA, 0xF9278673, 0xFDE69BC4,
-            0x89B8FD09, 0x8D79E0BE, 0x803AC667, 0x84FBDBD0, 0x9ABC8BD5, 0x9E7D9662, 0x933EB0BB, 0x97FFAD0C,
-            0xAFB010B1, 0xAB710D06, 0xA6322BDF, 0xA2F33668, 0xBCB4666D, 0xB8757BDA, 0xB5365D03, 0xB1F740B4
-        ]
-
-
-    def open_file(self, file_path, mode = 'rb'):
+        self.crctable = CRC_TABLE
+
+
+    def open_file(self, file_path, mode = 'rb', use_mmap = False):
         source_stream = builtins.open(file_path, mode)
-        self.data = source_stream.read()
+        # Read only mode: map the file and hand out memoryviews into it instead
+        # of copying. Views returned by read_misc() are only valid until close()
+        if use_mmap and os.fstat(source_stream.fileno()).st_size > 0:
+            self.mmap = mmap.mmap(source_stream.fileno(), 0, access=mmap.ACCESS_READ)
+            self.data = memoryview(self.mmap)
+        else:
+            self.data = source_stream.read()
         source_stream.close()
 
         self.length = len(self.data)
@@ -85,6 +213,58 @@ class IFF():
 
         #print(self.data)
 
+    def close(self):
+        if self.mmap != None:
+            self.data.release()
+            self.data = None
+            try:
+                self.mmap.close()
+            except BufferError:
+                # something still holds a view from read_misc(), the map goes
+                # away with the last one
+                pass
+            self.mmap = None
+
+    def buildIndex(self):
+        # Walks the whole file once and records every FORM and chunk in file
+        # order, so callers can jump straight to a block by path instead of
+        # stepping through it with enterForm/exitForm
+        self.index = []
+        pending = [(0, self.stack[0].length, 0, "")]
+        while len(pending) > 0:
+            start, end, depth, parent = pending.pop()
+            offset = start
+            children = []
+            while offset + 8 <= end:
+                tag = bytes(self.data[offset:offset+4]).decode('ASCII')
+                length = int.from_bytes(self.data[offset+4:offset+8], 'big')
+                if tag == "FORM":
+                    name = bytes(self.data[offset+8:offset+12]).decode('ASCII')
+                    entry = IndexEntry(name, True, offset, length - 4, depth, parent + name)
+                    children.append((entry.dataOffset, entry.dataOffset + entry.length, depth + 1, entry.path + "/"))
+                else:
+                    entry = IndexEntry(tag, False, offset, length, depth, parent + tag)
+                self.index.append(entry)
+                offset += 8 + length
+            pending.extend(reversed(children))
+        self.index.sort(key=lambda e: e.offset)
+        return self.index
+
+    def findChunks(self, path):
+        # path is matched against the end of each block's full path, e.g.
+        # "VTXA/0003/DATA" finds the vertex data of every SPS in a mesh
+        if self.index == None:
+            self.buildIndex()
+        return [e for e in self.index if e.path == path or e.path.endswith("/" + path)]
+
+    def findChunk(self, path):
+        found = self.findChunks(path)
+        return found[0] if len(found) > 0 else None
+
+    def getChunkData(self, entry):
+        start = entry.dataOffset
+        return self.data[start:start + entry.length]
+
     def getCurrentName(self):
         return self.getBlockName(self.stack_depth)
 
@@ -111,7 +291,7 @@ class IFF():
 
     def getFirstTag(self, depth):
         start = self.stack[depth].start + self.stack[depth].used
-        return self.data[start:start+4].decode('ASCII')
+        return bytes(self.data[start:start+4]).decode('ASCII')
 
     def getLength(self, depth, offset = 0):
         start = self.stack[depth].start + self.stack[depth].used + offset + 4
@@ -119,7 +299,7 @@ class IFF():
 
     def getSecondTag(self, depth):
         start = self.stack[depth].start + self.stack[depth].used + 8
-        return self.data[start:start+4].decode('ASCII') 
+        return bytes(self.data[start:start+4]).decode('ASCII') 
 
     def read_tag(self):
         # byte[] tag_bytes = new byte[4];
@@ -189,6 +369,14 @@ class IFF():
         self.stack[self.stack_depth] = s
         return readData
 
+    def read_array(self, dtype, count = -1):
+        # Reads count little-endian items, or as many whole items as remain in the chunk
+        dtype = numpy.dtype(dtype)
+        if count < 0:
+            s = self.stack[self.stack_depth]
+            count = (s.length - s.used) // dtype.itemsize
+        return numpy.frombuffer(self.read_misc(count * dtype.itemsize), dtype=dtype)
+
     def read_bool8(self):
         return self.read_uint8() != 0
 
@@ -219,13 +407,13 @@ class IFF():
     def read_string(self):
         s = self.stack[self.stack_depth]
         pos = (s.start + s.used)
-        end = self.data.find(b'\0', pos)
+        end = (self.mmap if self.mmap != None else self.data).find(b'\0', pos)
         if end != -1:
             s.used += (end - pos) + 1
-            return self.data[pos:end].decode('ASCII')
+            return bytes(self.data[pos:end]).decode('ASCII')
         else:
             s.used = len(self.data) + 1 # definitely wrong, but shits broke anyway
-            return self.data[pos:].decode('ASCII')
+            return bytes(self.data[pos:]).decode('ASCII')
 
     def read_float(self):
         return struct.unpack('f', self.read_misc(4))[0]
@@ -380,69 +568,6 @@ class IFF():
 
         self.stack[self.stack_depth].used += len(newData)
 
-    def insert_byte(self, b):
-        self.insertChunkData(int.to_bytes(b, 1, byteorder="little", signed=False))
-
-    def insert_bool(self, b):
-        self.insert_byte(1 if b else 0)
-
-    def insertChunkString(self, s, nullTerminate = True):
-        self.insertChunkData(s.encode('ASCII'))
-        if nullTerminate:
-            self.insert_byte(0)
-
-    def insertFloat(self, f):
-        self.insertChunkData(struct.pack('f', f))
-        
-    def insertFloatVector4(self, vec):
-        self.insertFloat(vec[0])
-        self.insertFloat(vec[1])
-        self.insertFloat(vec[2])
-        self.insertFloat(vec[3])
-
-    def insertFloatVector3(self, vec):
-        self.insertFloat(vec[0])
-        self.insertFloat(vec[1])
-        self.insertFloat(vec[2])
-
-    def insertFloatVector2(self, vec):
-        self.insertFloat(vec[0])
-        self.insertFloat(vec[1])
-
-    def insert_int8(self, i):
-        self.insertChunkData(int.to_bytes(i, 1, byteorder="little", signed=True))
-
-    def insert_int16(self, i):
-        self.insertChunkData(int.to_bytes(i, 2, byteorder="little", signed=True))
-
-    def insert_uint16(self, i):
-        self.insertChunkData(int.to_bytes(i, 2, byteorder="little", signed=False))
-
-    def insert_int32(self, i):
-        self.insertChunkData(int.to_bytes(i, 4, byteorder="little", signed=True))    
-
-    def insertInt32Vector3(self, vec):
-        self.insert_int32(vec[0])
-        self.insert_int32(vec[1])
-        self.insert_int32(vec[2])
-
-    def insert_uint32(self, i):
-        self.insertChunkData(int.to_bytes(i, 4, byteorder="little", signed=False))
-    
-    def insert_color(self, color):
-        r=int(numpy.clip(color[0]*255, 0, 255))
-        g=int(numpy.clip(color[1]*255, 0, 255))
-        b=int(numpy.clip(color[2]*255, 0, 255))
-        a=int(numpy.clip(color[3]*255, 0, 255))
-        
-        # NSG Seems like this should be ARGB per SOE code, but that makes 
-        # the Anchorhead Cantina look gross. Used trial and error to determine
-        # order: BGRA
-        self.insert_byte(b)
-        self.insert_byte(g)
-        self.insert_byte(r)
-        self.insert_byte(a)
-
     def insertIff(self, iff):
         #make sure the data array can handle this addition
         newLength=iff.stack[0].length
@@ -519,20 +644,79 @@ class IFF():
         now = time.time() 
         #print("Writing data took: " + str(datetime.timedelta(seconds=(now - t))))
 
-    def calculate(self):
-        print(f'Max size: {self.MAXINT}')
-        crc=0xFFFFFFFF
-        for d in self.data:
-            ind = self.int_overflow((crc>>24) ^ d) & 0xFF
 
-            #uind = int.from_bytes(ind.to_bytes(4, 'little', signed=True), 'little', signed=False)
-            temp = (self.crctable[ind] ^ (crc << 8))
-            crc = self.int_overflow(temp)
-            #print(f"{d}: Ind: {ind} Temp: {temp} CRC now {crc}")
-        return crc
+class IFFWriter(ChunkDataInserter):
+    # Append-only counterpart to IFF for building new files. IFF.insert* shifts
+    # everything after the insertion point and rewrites every enclosing size
+    # header on each call, which makes writing a file quadratic. Here data is
+    # only ever appended, and each FORM/chunk size is back-patched once when
+    # it's exited.
 
-    def int_overflow(self, val):
-        if not -self.MAXINT-1 <= val <= self.MAXINT:
-            val = (val + (self.MAXINT + 1)) % (2 * (self.MAXINT + 1)) - self.MAXINT - 1
-        return val
+    def __init__(self):
+        self.data = bytearray()
+        # [tag, name, offset of the big-endian size field] per open FORM/chunk
+        self.stack = []
+        self.inChunk = False
+        self.MAXINT= (2**31 - 1)
+        self.crctable = CRC_TABLE
+
+    def insertForm(self, name, shouldEnterForm = True):
+        self.data += b'FORM'
+        sizeOffset = len(self.data)
+        self.data += int.to_bytes(4, 4, byteorder='big', signed=False)
+        self.data += name.encode('ASCII')
+        if shouldEnterForm:
+            self.stack.append(["FORM", name, sizeOffset])
+
+    def insertNumberedForm(self, n, shouldEnterForm = True):
+        s=str(n).zfill(4)
+        self.insertForm(s, shouldEnterForm)
+
+    def insertChunk(self, name, shouldEnterChunk = True):
+        self.data += name.encode('ASCII')
+        sizeOffset = len(self.data)
+        self.data += int.to_bytes(0, 4, byteorder='big', signed=False)
+        if shouldEnterChunk:
+            self.stack.append([name, name, sizeOffset])
+            self.inChunk = True
+
+    def exitForm(self, name = ""):
+        if len(self.stack) == 0 or self.stack[-1][0] != "FORM":
+            print(f"[ExitForm] Requested: {name} but not in a FORM")
+            return
+        if name != "" and self.stack[-1][1] != name:
+            print(f"[ExitForm] Requested: {name} but found {self.stack[-1][1]}")
+            return
+        self.patchSize(self.stack.pop()[2])
+
+    def exitChunk(self, name):
+        if len(self.stack) == 0 or self.stack[-1][0] != name:
+            print(f"[ExitChunk] Requested: {name} but found {self.stack[-1][0] if len(self.stack) > 0 else None}")
+            return
+        self.patchSize(self.stack.pop()[2])
+        self.inChunk = False
 
+    def patchSize(self, sizeOffset):
+        size = len(self.data) - sizeOffset - 4
+        self.data[sizeOffset:sizeOffset+4] = int.to_bytes(size, 4, byteorder='big', signed=False)
+
+    def insertChunkData(self, newData):
+        self.data += newData
+
+    def insertIff(self, iff):
+        if isinstance(iff, IFFWriter):
+            self.insertChunkData(iff.data)
+        else:
+            self.insertChunkData(iff.data[0:iff.stack[0].length])
+
+    def insertIffData(self, data):
+        self.insertChunkData(data)
+
+    def write(self, file_path):
+        # Anything left open (e.g. AptFile never exits its forms) still needs
+        # correct sizes on disk
+        for frame in self.stack:
+            self.patchSize(frame[2])
+        f = builtins.open(file_path, 'wb')
+        f.write(self.data)
+        f.close()
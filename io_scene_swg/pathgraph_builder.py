@@ -0,0 +1,171 @@
+# MIT License
+#
+# Copyright (c) 2022 Nick Rafalski
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import math
+from sys import maxsize
+
+import numpy as np
+from mathutils import Vector
+
+from . import support
+from . import swg_types
+
+# Edges leaving the same node closer than this are redundant; the longer one goes
+PRUNE_ANGLE = (20.0 / 360.0) * (2.0 * math.pi)
+
+class PathGraphBuilder(object):
+    # Builds a FloorFile's PathGraph: portal nodes, waypoint visibility edges,
+    # redundant edge pruning and portal edges. Floor queries go through
+    # FloorFile.do_nodes_connect, which uses the floor's spatial index.
+    __slots__ = ('floor', 'graph', 'visible')
+    def __init__(self, floor):
+        self.floor = floor
+        self.graph = floor.pathGraph
+        # do_nodes_connect results keyed by unordered node index pair
+        self.visible = {}
+
+    def build(self, globalPortalIndecies):
+        if self.graph == None:
+            print("Error! Asked to build a pathGraph without first assigning one")
+            return
+        self.add_portal_nodes(globalPortalIndecies)
+        self.make_waypoint_connections()
+        self.prune_redundant_edges()
+        self.add_portal_edges()
+
+    def nodes_connect(self, nodeA, nodeB):
+        key = (min(nodeA.index, nodeB.index), max(nodeA.index, nodeB.index))
+        if key not in self.visible:
+            self.visible[key] = self.floor.do_nodes_connect(nodeA, nodeB)
+        return self.visible[key]
+
+    def add_edge(self, indexA, indexB):
+        edge = swg_types.PathGraphEdge()
+        edge.indexA = indexA
+        edge.indexB = indexB
+        self.graph.edges.append(edge)
+
+    def add_portal_nodes(self, globalPortalIndecies):
+        floor = self.floor
+        starting_size = len(self.graph.nodes)
+        last_index=-1
+
+        if starting_size > 0:
+            last_index = self.graph.nodes[-1].index
+
+        portalIdsAdded=set()
+        for tri in floor.tris:
+            A = None
+            B = None
+            pid = None
+            if tri.portalId1 != -1:
+                pid = globalPortalIndecies[tri.portalId1]
+                A = floor.verts[tri.corner1]
+                B = floor.verts[tri.corner2]
+            elif tri.portalId2 != -1:
+                pid = globalPortalIndecies[tri.portalId2]
+                A = floor.verts[tri.corner2]
+                B = floor.verts[tri.corner3]
+            elif tri.portalId3 != -1:
+                pid = globalPortalIndecies[tri.portalId3]
+                A = floor.verts[tri.corner3]
+                B = floor.verts[tri.corner1]
+            if pid != None and pid not in portalIdsAdded:
+                last_index += 1
+                node = swg_types.PathGraphNode()
+                node.type = 0
+                node.index = last_index
+                node.key = pid
+                node.position = Vector(A) + ((Vector(B) - Vector(A)) / 2.0)
+                node.radius = 0
+                self.graph.nodes.append(node)
+                portalIdsAdded.add(pid)
+
+        print(f"Added {len(portalIdsAdded)} portal nodes. Now at {len(self.graph.nodes)}")
+
+    def make_waypoint_connections(self):
+        # Visibility is symmetric, so each unordered pair is only tested once.
+        # Edges are still added in both directions, in the same order as before
+        waypoints = [n for n in self.graph.nodes if n.type == 1]
+        for node in waypoints:
+            for node2 in waypoints:
+                if node != node2 and self.nodes_connect(node, node2):
+                    self.add_edge(node.index, node2.index)
+
+    def prune_redundant_edges(self):
+        # Two edges leaving the same node at less than PRUNE_ANGLE apart are
+        # redundant and the longer one is dropped (both if they're the same
+        # length). Only edges sharing a node are compared
+        positions = np.array([list(n.position) for n in self.graph.nodes], dtype=np.float64).reshape(-1, 3)
+        edgesByNode = {}
+        edges = self.graph.edges
+        for ei, edge in enumerate(edges):
+            if edge.indexA == edge.indexB:
+                continue
+            edgesByNode.setdefault(edge.indexA, []).append(ei)
+            edgesByNode.setdefault(edge.indexB, []).append(ei)
+
+        edgesToRemove=set()
+        for shared, incident in edgesByNode.items():
+            if len(incident) < 2:
+                continue
+            others = [edges[ei].indexB if edges[ei].indexA == shared else edges[ei].indexA for ei in incident]
+            deltas = positions[others] - positions[shared]
+            lengths = np.linalg.norm(deltas, axis=1)
+            directions = np.divide(deltas, lengths[:, None], out=np.zeros_like(deltas), where=lengths[:, None] > 0)
+            for i in range(0, len(incident)):
+                for j in range(i + 1, len(incident)):
+                    # same or reversed edge
+                    if others[i] == others[j]:
+                        continue
+                    if support.angle_between_unnormalized(directions[i], directions[j]) < PRUNE_ANGLE:
+                        if lengths[i] >= lengths[j]:
+                            edgesToRemove.add(incident[i])
+                        if lengths[j] >= lengths[i]:
+                            edgesToRemove.add(incident[j])
+
+        before = len(edges)
+        self.graph.edges = [e for ei, e in enumerate(edges) if ei not in edgesToRemove]
+        print(f"Edges before: {before} but removed: {len(edgesToRemove)}. Now: {len(self.graph.edges)}")
+
+    def add_portal_edges(self):
+        # Each portal node connects both ways to the nearest node it can see.
+        # Candidates are tried nearest first, so most never need a visibility test
+        for node1 in self.graph.nodes:
+            if node1.type != 0:
+                continue
+
+            candidates = [n for n in self.graph.nodes if n.type != 0 and n != node1]
+            distances = [(Vector(n.position) - Vector(node1.position)).length for n in candidates]
+            minId = -1
+            for ci in sorted(range(0, len(candidates)), key=lambda i: distances[i]):
+                if distances[ci] >= maxsize:
+                    break
+                if self.nodes_connect(node1, candidates[ci]):
+                    minId = candidates[ci].index
+                    break
+
+            if minId != -1:
+                self.add_edge(node1.index, minId)
+                self.add_edge(minId, node1.index)
+                #print(f"Adding portal connecting edge from {node1.index} to {minId}!")
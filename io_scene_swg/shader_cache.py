@@ -0,0 +1,67 @@
+# MIT License
+#
+# Copyright (c) 2022 Nick Rafalski
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+from collections import OrderedDict
+from . import swg_types
+
+# Parsed SWGShaders shared by every importer in the session. Entries are keyed
+# by absolute path and re-parsed when the file's mtime changes; the least
+# recently used ones are dropped past MAX_SHADERS.
+
+MAX_SHADERS = 512
+
+_shaders = OrderedDict()
+_hits = 0
+_misses = 0
+
+def get(path):
+    global _hits, _misses
+    key = os.path.abspath(path)
+    try:
+        mtime = os.stat(key).st_mtime_ns
+    except OSError:
+        mtime = None
+    entry = _shaders.get(key)
+    if entry is not None and entry[0] == mtime:
+        _shaders.move_to_end(key)
+        _hits += 1
+        return entry[1]
+
+    _misses += 1
+    shader = swg_types.SWGShader(path)
+    _shaders[key] = (mtime, shader)
+    _shaders.move_to_end(key)
+    while len(_shaders) > MAX_SHADERS:
+        _shaders.popitem(last=False)
+    return shader
+
+def invalidate(path = None):
+    # Drop one shader, or all of them
+    if path is None:
+        _shaders.clear()
+    else:
+        _shaders.pop(os.path.abspath(path), None)
+
+def stats():
+    return {'shaders': len(_shaders), 'hits': _hits, 'misses': _misses}
@@ -1,13 +1,20 @@
-import os, bpy, math, mathutils
+import os, math, mathutils
 import numpy as np
-from bpy_extras.image_utils import load_image
-from bpy_extras import node_shader_utils
-from bpy_extras.io_utils import axis_conversion
+try:
+    import bpy, bmesh
+    from bpy_extras.image_utils import load_image
+    from bpy_extras import node_shader_utils
+    from bpy_extras.io_utils import axis_conversion
+except ImportError:
+    # running headless (cli.py); only the path and math helpers are usable
+    bpy = None
 from mathutils import Vector, Matrix
-import bmesh
 
+from . import asset_index
 from . import extents
 from . import swg_types
+from . import shader_cache
+from . import texture_cache
 
 def getChildren(myObject): 
     children = [] 
@@ -20,14 +27,33 @@ def clean_path(path):
     return path.replace('\\', '/') if (os.sep == '/') else path.replace('/', '\\')
 
 def find_file(relative_path, root):
-    root=clean_path(root)
-    relative_path=clean_path(relative_path)
-    if os.path.exists(os.path.join(root, relative_path)):
-        #print(f"Found {relative_path}! Returning: {os.path.join(root,relative_path)}")
-        return os.path.join(root,relative_path)
-    else:
-        #print(f"{os.path.join(root,relative_path)} doesn't exist!")
-        return None
+    # root may layer several extract dirs, see asset_index.split_roots
+    if not root:
+        relative_path=clean_path(relative_path)
+        return relative_path if os.path.exists(relative_path) else None
+    return asset_index.get(root).find(relative_path)
+
+def refind_file(relative_path, root):
+    # For a path from find_file that turned out to be gone: drops the stale
+    # index entry and looks again
+    if root:
+        asset_index.get(root).forget(relative_path)
+    return find_file(relative_path, root)
+
+def find_shader(relative_path, root):
+    # (absolute path, parsed SWGShader) or (None, None)
+    path = find_file(relative_path, root)
+    if path:
+        try:
+            return path, shader_cache.get(path)
+        except OSError:
+            path = refind_file(relative_path, root)
+            if path:
+                return path, shader_cache.get(path)
+    return None, None
+
+# converted texture path -> name of the bpy image loaded from it
+_images = {}
 
 def load_shared_image(path, root):   
     abs_path = find_file(path, root)
@@ -35,26 +61,145 @@ def load_shared_image(path, root):
         print (f"Error! Couldn't find image: {path}")
         return None
 
-    png_path = abs_path.replace(".dds",".png")
-    image = None
-    if abs_path:
-        shortname = os.path.basename(png_path)
-        for img in bpy.data.images: 
-            if shortname == img.name:
-                image = img
-                print(f"Found image: shortname at {abs_path}. Already is: {img.name}. Has data? {img.has_data}")
-                break
-    if image == None:
-        temp = load_image(abs_path, ".") 
-        temp.file_format = "PNG"  
-        temp.save_render(png_path)
-        image = load_image(png_path, ".")
-        # dds_path = png_path.replace(".png", "-converted.dds")
-        # image.file_format= "DDS"
-        # image.save_render(dds_path)
-        bpy.data.images.remove(temp)
+    if abs_path.lower().endswith(".png"):
+        png_path = abs_path
+    else:
+        try:
+            png_path = texture_cache.cache_path(abs_path)
+        except OSError:
+            abs_path = refind_file(path, root)
+            if not abs_path:
+                print (f"Error! Couldn't find image: {path}")
+                return None
+            png_path = texture_cache.cache_path(abs_path)
+
+    image = bpy.data.images.get(_images.get(png_path, ""))
+    if image is not None and os.path.normpath(bpy.path.abspath(image.filepath)) == os.path.normpath(png_path):
+        return image
+
+    if not os.path.exists(png_path) and not convert_image(abs_path, png_path):
+        return None
+    image = load_image(png_path, ".", check_existing=True)
+    if image:
+        # name it after the texture rather than the hashed cache file
+        if image.name == os.path.basename(png_path):
+            image.name = os.path.splitext(os.path.basename(abs_path))[0] + ".png"
+        _images[png_path] = image.name
     return image
 
+def convert_image(source_path, png_path):
+    # Decodes source_path with Blender and writes it to png_path. Written under
+    # a temporary name first so other sessions never pick up a partial file
+    temp = load_image(source_path, ".")
+    if not temp:
+        print(f"Error! Couldn't load image: {source_path}")
+        return False
+    temp.file_format = "PNG"
+    temp_path = f"{png_path}.{os.getpid()}.png"
+    temp.save_render(temp_path)
+    bpy.data.images.remove(temp)
+    os.replace(temp_path, png_path)
+    return True
+
+def appearance_shaders(path, root):
+    # Every shader used by an .apt, .lod or .msh, for converting textures up front
+    if path.endswith(".apt"):
+        apt = swg_types.AptFile(path)
+        apt.load()
+        reference = apt.get_reference_fullpath(root)
+        return appearance_shaders(reference, root) if reference else []
+    elif path.endswith(".lod"):
+        lod = swg_types.LodFile(path)
+        if not lod.load(path):
+            return []
+        shaders = []
+        for child in lod.lods.values():
+            child_path = find_file(os.path.join("appearance", child[2]), root)
+            if child_path:
+                shaders += appearance_shaders(child_path, root)
+        return shaders
+    elif path.endswith(".msh"):
+        shaders = []
+        for name in swg_types.SWGMesh(path, root).shader_names():
+            shader_path, shader = find_shader(name, root)
+            if shader:
+                shaders.append(shader)
+        return shaders
+    return []
+
+def shader_texture_paths(shaders, root):
+    sources = []
+    for shader in shaders:
+        if shader:
+            for path in (shader.main, shader.normal, shader.spec):
+                abs_path = find_file(path, root) if path else None
+                if abs_path:
+                    sources.append(abs_path)
+    return sources
+
+def preconvert_shader_textures(shaders, root):
+    # Converts every texture the shaders use that isn't in the texture cache yet,
+    # in parallel, so configuring the materials afterwards only loads PNGs
+    sources = shader_texture_paths(shaders, root)
+    if len(sources) == 0:
+        return
+
+    wm = bpy.context.window_manager
+    def progress(done, total, source_path, converted):
+        print(f"Texture {done}/{total}: {source_path}" + ("" if converted else " (unsupported, Blender will convert it)"))
+        wm.progress_update(done / total)
+
+    wm.progress_begin(0, 1)
+    try:
+        texture_cache.convert_missing(sources, progress)
+    finally:
+        wm.progress_end()
+
+# custom property holding the .sht path of a material whose setup was deferred
+DEFERRED_SHADER = "SWG_DeferredShader"
+
+def set_up_material(material, shader, root_dir, defer = False):
+    # With defer the material stays a placeholder tagged with the shader path
+    # until configure_deferred_materials gets to it
+    if defer:
+        material[DEFERRED_SHADER] = shader.path
+    else:
+        if DEFERRED_SHADER in material:
+            del material[DEFERRED_SHADER]
+        configure_material_from_swg_shader(material, shader, root_dir)
+
+def deferred_materials():
+    return [mat for mat in bpy.data.materials if DEFERRED_SHADER in mat]
+
+def deferred_batch(root_dir, limit = None):
+    # The next deferred materials as (material name, shader) pairs. Names rather
+    # than materials, the batch may outlive a material deleted in the meantime
+    batch = []
+    for material in deferred_materials()[:limit]:
+        path = material[DEFERRED_SHADER]
+        shader = None
+        if os.path.exists(path):
+            shader = shader_cache.get(path)
+        else:
+            print(f"Couldn't find deferred shader {path} for material {material.name}")
+        batch.append((material.name, shader))
+    return batch
+
+def configure_deferred_batch(batch, root_dir):
+    for name, shader in batch:
+        material = bpy.data.materials.get(name)
+        if material and DEFERRED_SHADER in material:
+            del material[DEFERRED_SHADER]
+            if shader:
+                configure_material_from_swg_shader(material, shader, root_dir)
+
+def configure_deferred_materials(root_dir, limit = None):
+    # Sets up at most limit deferred materials in one go, returns how many are still waiting
+    batch = deferred_batch(root_dir, limit)
+    preconvert_shader_textures([shader for name, shader in batch], root_dir)
+    configure_deferred_batch(batch, root_dir)
+    return len(deferred_materials())
+
 def configure_material_from_swg_shader(material, shader, root_dir):
     ma_wrap = node_shader_utils.PrincipledBSDFWrapper(material, is_readonly=False)
     ma_wrap.use_nodes = True
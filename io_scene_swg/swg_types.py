@@ -22,12 +22,12 @@
 from audioop import cross
 import math
 from re import I
-from sys import maxsize
 from xml.dom import minidom
 from . import support
 from . import nsg_iff
 from . import vertex_buffer_format
 from . import extents
+import numpy as np
 import mathutils
 from mathutils import Vector
 
@@ -80,7 +80,7 @@ class LmgFile(object):
         self.mgns = mgns
 
     def write(self):
-        iff = nsg_iff.IFF(initial_size=512000)      
+        iff = nsg_iff.IFFWriter()      
         iff.insertForm("MLOD")
         iff.insertForm("0000")
 
@@ -102,7 +102,7 @@ class SatFile(object):
         self.skeletons = skeletons
 
     def write(self):
-        iff = nsg_iff.IFF(initial_size=512000)      
+        iff = nsg_iff.IFFWriter()      
         iff.insertForm("SMAT")
         iff.insertForm("0003")
 
@@ -131,7 +131,7 @@ class AptFile(object):
         self.reference = reference
 
     def write(self):
-        iff = nsg_iff.IFF(initial_size=512000)      
+        iff = nsg_iff.IFFWriter()      
         iff.insertForm("APT ")
         iff.insertForm("0000")
         iff.insertChunk("NAME")
@@ -318,7 +318,7 @@ class PobFile(object):
         self.crc = None
 
     def write(self, fullpath):
-        iff = nsg_iff.IFF(initial_size=512000)      
+        iff = nsg_iff.IFFWriter()      
         iff.insertForm("PRTO")
         iff.insertForm("0004")
         iff.insertChunk("DATA")
@@ -398,14 +398,14 @@ class PobFile(object):
             for light in cell.lights:
                 iff.insert_int8(light.lightType)
                 iff.insertFloat(0)
-                iff.insertFloat(light.diffuse_color.r)
-                iff.insertFloat(light.diffuse_color.g)
-                iff.insertFloat(light.diffuse_color.b)
+                iff.insertFloat(light.diffuse_color[0])
+                iff.insertFloat(light.diffuse_color[1])
+                iff.insertFloat(light.diffuse_color[2])
                 
                 iff.insertFloat(0)
-                iff.insertFloat(light.specular_color.r)
-                iff.insertFloat(light.specular_color.g)
-                iff.insertFloat(light.specular_color.b)
+                iff.insertFloat(light.specular_color[0])
+                iff.insertFloat(light.specular_color[1])
+                iff.insertFloat(light.specular_color[2])
 
                 iff.insertFloat(light.transform[0])
                 iff.insertFloat(light.transform[1])
@@ -765,7 +765,7 @@ class LodFile(object):
         return True
 
     def write(self, fullpath):
-        iff = nsg_iff.IFF(initial_size=512000)      
+        iff = nsg_iff.IFFWriter()      
         iff.insertForm("DTLA")
         iff.insertForm("0008")
         
@@ -904,6 +904,10 @@ class FloorTri(object):
     Crossable = 1
     WallBase = 2
     WallTop = 3
+
+    # Packed TRIS record, same layout as read_0002/write_0002
+    DTYPE_0002 = np.dtype([('corners', '<i4', 3), ('index', '<i4'), ('nindex', '<i4', 3), ('normal', '<f4', 3),
+                           ('edgeType', 'i1', 3), ('fallthrough', '?'), ('partTag', '<i4'), ('portalId', '<i4', 3)])
     __slots__ = ('corner1','corner2','corner3','index','nindex1','nindex2','nindex3','normal','edgeType1','edgeType2','edgeType3','fallthrough','partTag','portalId1','portalId2','portalId3')
     def __init__(self):
         self.corner1 = 0
@@ -983,6 +987,7 @@ class FloorTri(object):
         iff.insert_int32(self.portalId3)
 
 class PathEdge(object):
+    DTYPE = np.dtype([('tri', '<i4'), ('edge', '<i4'), ('crossable', '?')])
     __slots__ = ('tri','edge','crossable')
     def __init__(self, tri, edge, crossable):
         self.tri = tri
@@ -994,15 +999,105 @@ class PathEdge(object):
         iff.insert_int32(self.edge)
         iff.insert_bool(self.crossable)
 
+class TriangleGrid(object):
+    # Uniform grid over the XZ plane. Each item is an axis-aligned box given as
+    # (minX, minZ, maxX, maxZ); query() returns the items whose box overlaps
+    # the query box, in ascending index order
+    __slots__ = ('boxes', 'cellSize', 'cells')
+    def __init__(self, boxes):
+        self.boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self.cells = {}
+        if len(self.boxes) == 0:
+            self.cellSize = 1.0
+            return
+
+        extents = self.boxes[:, 2:4] - self.boxes[:, 0:2]
+        self.cellSize = max(float(np.mean(extents)), 0.001)
+        lo = np.floor(self.boxes[:, 0:2] / self.cellSize).astype(np.int64)
+        hi = np.floor(self.boxes[:, 2:4] / self.cellSize).astype(np.int64)
+        for i in range(0, len(self.boxes)):
+            for x in range(lo[i][0], hi[i][0] + 1):
+                for z in range(lo[i][1], hi[i][1] + 1):
+                    self.cells.setdefault((x, z), []).append(i)
+
+    def query(self, minX, minZ, maxX, maxZ):
+        lo = (math.floor(minX / self.cellSize), math.floor(minZ / self.cellSize))
+        hi = (math.floor(maxX / self.cellSize), math.floor(maxZ / self.cellSize))
+        found = set()
+        if (hi[0] - lo[0] + 1) * (hi[1] - lo[1] + 1) > len(self.cells):
+            for items in self.cells.values():
+                found.update(items)
+        else:
+            for x in range(lo[0], hi[0] + 1):
+                for z in range(lo[1], hi[1] + 1):
+                    found.update(self.cells.get((x, z), []))
+        return [i for i in sorted(found) if self.boxes[i][0] <= maxX and self.boxes[i][2] >= minX and self.boxes[i][1] <= maxZ and self.boxes[i][3] >= minZ]
+
 class FloorFile(object):
+    # how far a node may be from the floor and still count as standing on it
+    NODE_TOLERANCE = 0.1
 
-    __slots__ = ('path', 'verts', 'tris', 'pathGraph')
+    __slots__ = ('path', '_verts', '_tris', 'pathGraph', '_pointIndex', '_edgeIndex', '_indexKey')
     def __init__(self, path):
         self.path = path
         self.verts = []
         self.tris = []
         self.pathGraph = None
 
+    @property
+    def verts(self):
+        return self._verts
+
+    @verts.setter
+    def verts(self, verts):
+        self._verts = verts
+        self.invalidate_spatial_index()
+
+    @property
+    def tris(self):
+        return self._tris
+
+    @tris.setter
+    def tris(self, tris):
+        self._tris = tris
+        self.invalidate_spatial_index()
+
+    def invalidate_spatial_index(self):
+        # Must be called after moving verts or changing tri corners in place.
+        # Appending to verts/tris or reassigning them is picked up on its own
+        self._pointIndex = None
+        self._edgeIndex = None
+        self._indexKey = None
+
+    def get_spatial_index(self):
+        # Two grids over the triangles' XZ bounds. The point grid is grown by
+        # NODE_TOLERANCE for locating nodes. The edge grid is grown by the
+        # longest edge, which bounds where do_lines_intersect() can report a
+        # hit for any of the triangle's edges
+        key = (len(self._verts), len(self._tris))
+        if self._indexKey != key:
+            corners = np.array([[self._verts[i] for i in [t.corner1, t.corner2, t.corner3]] for t in self._tris], dtype=np.float64).reshape(-1, 3, 3)
+            lo = corners[:, :, [0, 2]].min(axis=1)
+            hi = corners[:, :, [0, 2]].max(axis=1)
+            reach = np.linalg.norm(corners - corners[:, [1, 2, 0], :], axis=2).max(axis=1, initial=0)[:, None]
+            self._pointIndex = TriangleGrid(np.hstack([lo - FloorFile.NODE_TOLERANCE, hi + FloorFile.NODE_TOLERANCE]))
+            self._edgeIndex = TriangleGrid(np.hstack([lo - reach, hi + reach]))
+            self._indexKey = key
+        return self._pointIndex, self._edgeIndex
+
+    def locate_point(self, position):
+        # The point on the first floor triangle within NODE_TOLERANCE of
+        # position, or None
+        pointIndex, edgeIndex = self.get_spatial_index()
+        point = Vector(position)
+        for ti in pointIndex.query(point[0], point[2], point[0], point[2]):
+            tri = self.tris[ti]
+            corners = [Vector(self.verts[i]) for i in [tri.corner1, tri.corner2, tri.corner3]]
+            result = mathutils.geometry.intersect_point_tri(point, corners[0], corners[1], corners[2])
+            if result != None and (result - point).length <= FloorFile.NODE_TOLERANCE:
+                return result
+        return None
+
     def __str__(self):
         return f"Path: {self.path}"
 
@@ -1052,20 +1147,28 @@ class FloorFile(object):
         return True
 
     def write(self):
-        iff = nsg_iff.IFF(initial_size=512000)
+        iff = nsg_iff.IFFWriter()
         iff.insertForm("FLOR")
         iff.insertForm("0006")
 
         iff.insertChunk("VERT")
         iff.insert_int32(len(self.verts))
-        for v in self.verts:
-            iff.insertFloatVector3(v)
+        iff.insertArray(np.array(self.verts, dtype=np.float32).reshape(-1, 3))
         iff.exitChunk("VERT")
 
         iff.insertChunk("TRIS")
         iff.insert_int32(len(self.tris))
-        for t in self.tris:
-            t.write_0002(iff)
+        tris = np.zeros(len(self.tris), dtype=FloorTri.DTYPE_0002)
+        if len(self.tris) > 0:
+            tris['corners'] = [(t.corner1, t.corner2, t.corner3) for t in self.tris]
+            tris['index'] = [t.index for t in self.tris]
+            tris['nindex'] = [(t.nindex1, t.nindex2, t.nindex3) for t in self.tris]
+            tris['normal'] = [t.normal for t in self.tris]
+            tris['edgeType'] = [(t.edgeType1, t.edgeType2, t.edgeType3) for t in self.tris]
+            tris['fallthrough'] = [t.fallthrough for t in self.tris]
+            tris['partTag'] = [t.partTag for t in self.tris]
+            tris['portalId'] = [(t.portalId1, t.portalId2, t.portalId3) for t in self.tris]
+        iff.insertArray(tris)
         iff.exitChunk("TRIS")
 
         borderEdges = []
@@ -1078,8 +1181,7 @@ class FloorFile(object):
                 borderEdges.append(PathEdge(index, 2, (tri.edgeType1 != FloorTri.Uncrossable)))
         iff.insertChunk("BEDG")
         iff.insert_int32(len(borderEdges))
-        for be in borderEdges:
-            be.write(iff)
+        iff.insertArray(np.array([(be.tri, be.edge, be.crossable) for be in borderEdges], dtype=PathEdge.DTYPE))
         iff.exitChunk("BEDG")
 
         if self.pathGraph != None:
@@ -1089,35 +1191,9 @@ class FloorFile(object):
 
     def do_nodes_connect(self, nodeA, nodeB):
 
-        resultA = None
-        resultB = None
-
         # First locate which triangles the nodes are on..
-        for tiA, triA in enumerate(self.tris):
-            corners = [Vector(self.verts[i]) for i in [triA.corner1, triA.corner2, triA.corner3]]
-            pointA = Vector(nodeA.position)
-            resultA = mathutils.geometry.intersect_point_tri(pointA, corners[0], corners[1], corners[2])
-            if resultA != None:
-                distA = (resultA - pointA).length
-                #print(f"Node {nodeA.index} at {nodeA.position} is above tri: {ti} with corners ({self.verts[tri.corner1]}, {self.verts[tri.corner2]}, {self.verts[tri.corner3]} Result: {resultA}) Dist: {distA}")
-                if resultA > 0.1:
-                    resultA = None
-                else:
-                    #print(f"Node {nodeA.index} at {nodeA.position} is above tri: {tiA} with corners ({self.verts[triA.corner1]}, {self.verts[triA.corner2]}, {self.verts[triA.corner3]} Result: {resultA}) Dist: {distA}")
-                    break
-        
-        for tiB, triB in enumerate(self.tris):
-            cornersB = [Vector(self.verts[i]) for i in [triB.corner1, triB.corner2, triB.corner3]]
-            pointB = Vector(nodeB.position)
-            resultB = mathutils.geometry.intersect_point_tri(pointB, cornersB[0], cornersB[1], cornersB[2])
-            if resultB != None:
-                distB = (resultB - pointB).length
-                #print(f"Node {nodeB.index} at {nodeB.position} is above tri: {ti} with corners ({self.verts[tri.corner1]}, {self.verts[tri.corner2]}, {self.verts[tri.corner3]}) Result: {resultB} Dist: {distB}")
-                if distB > 0.1:
-                    resultB = None
-                else:
-                    #print(f"Node {nodeB.index} at {nodeB.position} is above tri: {tiB} with corners ({self.verts[triB.corner1]}, {self.verts[triB.corner2]}, {self.verts[triB.corner3]}) Result: {resultB} Dist: {distB}")
-                    break
+        resultA = self.locate_point(nodeA.position)
+        resultB = self.locate_point(nodeB.position)
 
         if (resultA == None) or (resultB == None):
             #print(f"One of the nodes at {nodeA.position} or {nodeB.position} are't on a floor triangle! Skipping!")
@@ -1127,7 +1203,12 @@ class FloorFile(object):
             #print(f"NodeB: {nodeB.index} at {nodeB.position} on triangle at {resultB}")
             pass
 
-        for ti, tri in enumerate(self.tris):
+        # do_lines_intersect() only hits within |AB| of the path's midpoint
+        pointIndex, edgeIndex = self.get_spatial_index()
+        mid = (resultA + resultB) / 2.0
+        reach = (resultB - resultA).length
+        for ti in edgeIndex.query(mid[0] - reach, mid[2] - reach, mid[0] + reach, mid[2] + reach):
+            tri = self.tris[ti]
             corners = [Vector(self.verts[i]) for i in [tri.corner1, tri.corner2, tri.corner3]]
             if self.do_lines_intersect(resultA, resultB, corners[0], corners[1]) and (tri.edgeType1 == FloorTri.Uncrossable):
                 return False
@@ -1156,157 +1237,6 @@ class FloorFile(object):
         distBC = (c - b).length
         return ((distAC < distAB) and (distBC < distAB))
 
-
-    def make_waypoint_connections(self):
-        if self.pathGraph == None:
-            print(f"Error! Asked to make waypoint connecitons without first assigning pathGraph")
-            return
-
-        for node in self.pathGraph.nodes:
-            if node.type == 1:
-                for node2 in self.pathGraph.nodes:
-                    if node2.type == 1 and (node != node2):
-                        if self.do_nodes_connect(node, node2):
-                            #print(f"Nodes {node.position} and {node2.position} are connected!")                         
-                            edge = PathGraphEdge()
-                            edge.indexA = node.index
-                            edge.indexB = node2.index
-                            self.pathGraph.edges.append(edge)      
-        
-
-    def add_portal_nodes(self, globalPortalIndecies):
-        if self.pathGraph == None:
-            print(f"Error! Asked to add_portal_nodes without first assigning pathGraph")
-            return
-
-        starting_size = len(self.pathGraph.nodes)
-        last_index=-1
-
-        if starting_size > 0:
-            last_index = self.pathGraph.nodes[-1].index
-
-        portalIdsAdded=set()
-        for tri in self.tris:
-            A = None
-            B = None
-            C = None
-            pid = None
-            if tri.portalId1 != -1:
-                pid = globalPortalIndecies[tri.portalId1]
-                A = Vector(self.verts[tri.corner1])
-                B = Vector(self.verts[tri.corner2])
-            elif tri.portalId2 != -1:
-                pid = globalPortalIndecies[tri.portalId2]
-                A = Vector(self.verts[tri.corner2])
-                B = Vector(self.verts[tri.corner3])
-            elif tri.portalId3 != -1:
-                pid = globalPortalIndecies[tri.portalId3]
-                A = Vector(self.verts[tri.corner3])
-                B = Vector(self.verts[tri.corner1])
-            if pid != None:
-                C = A + ((B-A) / 2.0)
-                if pid not in portalIdsAdded:
-                    last_index += 1
-                    node = PathGraphNode()
-                    node.type = 0
-                    node.index = last_index
-                    node.key = pid
-                    node.position = C
-                    node.radius = 0
-                    self.pathGraph.nodes.append(node)
-                    portalIdsAdded.add(pid)
-
-        print(f"Added {len(portalIdsAdded)} portal nodes. Now at {len(self.pathGraph.nodes)}")
-
-
-    def add_portal_edges(self):
-        if self.pathGraph == None:
-            print(f"Error! Asked to add_portal_edges without first assigning pathGraph")
-            return
-
-        for ni1, node1 in enumerate(self.pathGraph.nodes):
-            if node1.type != 0: 
-                continue
-
-            minId = -1
-            minDist = maxsize
-
-            for ni2, node2 in enumerate(self.pathGraph.nodes):
-                if node2.type == 0 or (node1 == node2): 
-                    continue
-
-                connectable = self.do_nodes_connect(node1, node2)
-                dist = (Vector(node2.position) - Vector(node1.position)).length
-                #print(f"Comparing node {node1.index} to node {node2.index} Connectable: {connectable} dist: {dist}")
-                if connectable and (dist < minDist):
-                    minDist = dist
-                    minId = node2.index
-                    #print(f"   {node2.index} is better!")
-                else:
-                    #print(f"   {node2.index} is not better")
-                    pass
-
-            if minId != -1:
-                edge = PathGraphEdge()
-                edge.indexA = node1.index
-                edge.indexB = minId
-                self.pathGraph.edges.append(edge)
-
-                edge2 = PathGraphEdge()
-                edge2.indexA = minId
-                edge2.indexB = node1.index
-                self.pathGraph.edges.append(edge2)
-
-                #print(f"Adding portal connecting edge from {node1.index} to {minId}!")
-                
-
-    def prune_redundant_edges(self):
-        edgesToRemove=set()
-        for edge1 in self.pathGraph.edges:
-            for edge2 in self.pathGraph.edges:
-
-                AA = edge1.indexA
-                AB = edge1.indexB
-                BA = edge2.indexA
-                BB = edge2.indexB
-
-                if ((AA == BA) and (AB == BB)):
-                    continue
-                if ((AA == BB) and (AB == BA)):
-                    continue
-
-                if(AA == BA):
-                    A = Vector(self.pathGraph.nodes[AA].position)
-                    B = Vector(self.pathGraph.nodes[AB].position)
-                    C = Vector(self.pathGraph.nodes[BB].position)
-                elif(AA == BB):
-                    A = Vector(self.pathGraph.nodes[AA].position)
-                    B = Vector(self.pathGraph.nodes[AB].position)
-                    C = Vector(self.pathGraph.nodes[BA].position)
-                elif(AB == BA):
-                    A = Vector(self.pathGraph.nodes[AB].position)
-                    B = Vector(self.pathGraph.nodes[AA].position)
-                    C = Vector(self.pathGraph.nodes[BB].position)
-                elif(AB == BB):
-                    A = Vector(self.pathGraph.nodes[AB].position)
-                    B = Vector(self.pathGraph.nodes[AA].position)
-                    C = Vector(self.pathGraph.nodes[BA].position)
-                else:                
-                    continue
-
-                dA = (B-A).normalized()
-                dB = (C-A).normalized()
-                if(support.angle_between_unnormalized(dA, dB) < ((20.0 / 360.0) * (2.0 * math.pi))):
-                    if((B-A).length > (C-A).length):
-                        edgesToRemove.add(edge1)
-                    else:
-                        edgesToRemove.add(edge2)
-        before=len(self.pathGraph.edges)
-        for e in edgesToRemove:
-            if e in self.pathGraph.edges:
-                self.pathGraph.edges.remove(e)        
-        print(f"Edges before: {before} but removed: {len(edgesToRemove)}. Now: {len(self.pathGraph.edges)}")
-
 class MgnHardpoint(object):
     __slots__ = ('name', 'parent', 'orientation', 'position')
     def __init__(self, name, parent, orientation, position):
@@ -1341,7 +1271,15 @@ class Triangle(object):
         self.p1 = p1
         self.p2 = p2
         self.p3 = p3
-        
+
+    # indexable like the [p1, p2, p3] lists the exporters build, so writers take either
+    def __len__(self):
+        return 3
+    def __getitem__(self, i):
+        return (self.p1, self.p2, self.p3)[i]
+    def __iter__(self):
+        return iter((self.p1, self.p2, self.p3))
+
     def __str__(self):
         return f"[{self.p1}, {self.p2}, {self.p3}]"
     def __repr__(self):
@@ -1488,24 +1426,135 @@ class SWGShader(object):
                 iff.exitChunk("NAME")
 
 class SPS(object):
-    __slots__ = ('no', 'shader', 'flags', 'verts', 'tris', 'full_shader_path', 'real_shader')
+    __slots__ = ('no', 'shader', 'flags', '_verts', '_tris', 'full_shader_path', 'real_shader',
+                 'vertex_count', 'positions', 'normals', 'colors0', 'colors1', 'uvs', 'dot3', 'indices')
     def __init__(self):
         self.no = 0
         self.shader = ""
         self.flags = 0
-        self.verts = []
-        self.tris = []
         self.full_shader_path = None
         self.real_shader = None
+        self.set_vertex_data(None)
+        self.verts = []
+        self.tris = []
 
     def __init__(self, no , shader, flags, verts, tris):
         self.no = no
         self.shader = shader
         self.flags = flags
-        self.verts = verts
-        self.tris = tris
         self.full_shader_path = None
         self.real_shader = None
+        self.set_vertex_data(None)
+        self.verts = verts
+        self.tris = tris
+
+    def set_vertex_data(self, data):
+        # Keeps the decoded VTXA DATA as column arrays. data is a structured
+        # array using vertex_buffer_format.getVertexDtype(self.flags)
+        self._verts = None
+        self.vertex_count = 0 if data is None else len(data)
+        self.positions = None
+        self.normals = None
+        self.colors0 = None
+        self.colors1 = None
+        self.uvs = []
+        self.dot3 = None
+        if data is None:
+            return
+
+        names = data.dtype.names
+        if 'position' in names:
+            self.positions = np.array(data['position'], dtype=np.float32)
+        if 'normal' in names:
+            self.normals = np.array(data['normal'], dtype=np.float32)
+        # BGRA bytes to RGBA floats
+        if 'color0' in names:
+            self.colors0 = data['color0'][:, [2, 1, 0, 3]] / 255.0
+        if 'color1' in names:
+            self.colors1 = data['color1'][:, [2, 1, 0, 3]] / 255.0
+        self.uvs = []
+        for i in range(0, self.getNumUVSets()):
+            dim = vertex_buffer_format.getTextureCoordinateSetDimension(self.flags, i)
+            self.uvs.append(np.array(data[f'uv{i}'], dtype=np.float32).reshape(len(data), dim))
+        if 'dot3' in names:
+            self.dot3 = np.array(data['dot3'], dtype=np.float32)
+
+    @property
+    def verts(self):
+        # SWGVertex objects are only built if something asks for them
+        if self._verts is None:
+            self._verts = []
+            for i in range(0, self.vertex_count):
+                v = SWGVertex()
+                if self.positions is not None:
+                    v.pos = Vector(self.positions[i].tolist())
+                if self.normals is not None:
+                    v.normal = Vector(self.normals[i].tolist())
+                if self.colors0 is not None:
+                    v.color0 = self.colors0[i].tolist()
+                if self.colors1 is not None:
+                    v.color1 = self.colors1[i].tolist()
+                v.texs = [uv[i].tolist() for uv in self.uvs]
+                self._verts.append(v)
+        return self._verts
+
+    @verts.setter
+    def verts(self, verts):
+        self._verts = verts
+
+    def get_vertex_count(self):
+        return self.vertex_count if self._verts is None else len(self._verts)
+
+    def reorder_vertices(self, vertex_order):
+        # Permutes the column arrays so new vertex i is old vertex vertex_order[i]
+        self._verts = None
+        for name in ('positions', 'normals', 'colors0', 'colors1', 'dot3'):
+            column = getattr(self, name)
+            if column is not None:
+                setattr(self, name, np.asarray(column)[vertex_order])
+        self.uvs = [np.asarray(uv)[vertex_order] for uv in self.uvs]
+
+    def get_vertex_columns(self):
+        # (positions, normals, colors0, colors1, texs) from whichever of the
+        # column arrays or the SWGVertex list is current. texs is a list of
+        # (N, dim) arrays in file order, DOT3 last
+        if self._verts is None:
+            texs = list(self.uvs) + ([self.dot3] if self.dot3 is not None else [])
+            return self.positions, self.normals, self.colors0, self.colors1, texs
+
+        verts = self._verts
+        if len(verts) == 0:
+            return None, None, None, None, []
+        positions = [v.pos for v in verts]
+        normals = [v.normal for v in verts]
+        colors0 = [v.color0 for v in verts] if verts[0].color0 is not None else None
+        colors1 = [v.color1 for v in verts] if verts[0].color1 is not None else None
+        texs = []
+        if sum(len(uv_set) for uv_set in verts[0].texs) > 0:
+            texs.append(np.array([[value for uv_set in v.texs for value in uv_set] for v in verts], dtype=np.float64))
+        return positions, normals, colors0, colors1, texs
+
+    @property
+    def tris(self):
+        # Triangle objects are only built from self.indices if something asks for them
+        if self._tris is None:
+            self._tris = [Triangle(*t) for t in self.indices.tolist()] if self.indices is not None else []
+        return self._tris
+
+    @tris.setter
+    def tris(self, tris):
+        # Passing an (N,3) array keeps it as self.indices, a list is taken as Triangles
+        if isinstance(tris, np.ndarray):
+            self._tris = None
+            self.indices = tris
+        else:
+            self._tris = tris
+            self.indices = None
+
+    def get_indices(self):
+        if self._tris is None and self.indices is not None:
+            return self.indices
+        return np.array([(t.p1, t.p2, t.p3) for t in self._tris], dtype=np.int64).reshape(-1, 3)
 
     def hasDOT3(self):
         num_uv_sets = vertex_buffer_format.getNumberOfTextureCoordinateSets(self.flags)
@@ -1533,7 +1582,7 @@ class SPS(object):
             return self.shader.split('/')[1].split('.')[0]
 
     def __str__(self):
-        return f"SPS_No: {self.no} Shader: {self.shader} Flags: {self.flags} Verts: {len(self.verts)} Tris: {len(self.tris)}"
+        return f"SPS_No: {self.no} Shader: {self.shader} Flags: {self.flags} Verts: {self.get_vertex_count()} Tris: {len(self.get_indices())}"
 
     def __repr__(self):
         return self.__str__()
@@ -1568,6 +1617,35 @@ class SWGMesh(object):
         else: 
             return "(No Collision)"
 
+    def pack_vertices(self, sps):
+        # One packed record per vertex, in the same order write() always used:
+        # position, normal, color0, color1, then every texture coordinate set
+        positions, normals, colors0, colors1, texs = sps.get_vertex_columns()
+        count = sps.get_vertex_count()
+        fields = [('pos', '<f4', 3), ('normal', '<f4', 3)]
+        if vertex_buffer_format.hasColor0(sps.flags):
+            fields.append(('color0', 'u1', 4))
+        if vertex_buffer_format.hasColor1(sps.flags):
+            fields.append(('color1', 'u1', 4))
+        tex_count = sum(t.shape[1] for t in texs)
+        if tex_count > 0:
+            fields.append(('texs', '<f4', tex_count))
+
+        data = np.zeros(count, dtype=np.dtype(fields))
+        if count == 0:
+            return data
+
+        data['pos'] = positions
+        data['normal'] = normals
+        for name, colors in [('color0', colors0), ('color1', colors1)]:
+            if name in data.dtype.names:
+                rgba = np.clip(np.asarray(colors, dtype=np.float64) * 255, 0, 255).astype(np.uint8)
+                # stored BGRA, see nsg_iff.insert_color
+                data[name] = rgba[:, [2, 1, 0, 3]]
+        if tex_count > 0:
+            data['texs'] = np.concatenate(texs, axis=1)
+        return data
+
     def debug_flags(self, flags, sps_no):
 
         num_uv_sets = vertex_buffer_format.getNumberOfTextureCoordinateSets(flags)
@@ -1591,60 +1669,16 @@ class SWGMesh(object):
         if vertex_buffer_format.hasColor1(flags):
             print(f'Mesh: {self.filename} SPS: {sps_no} Flags: {flags}: Has Color1. Never seen that before! Not doing anything with it FYI')
 
-
-    def read_vertex(self, flags, iff):
-        v = SWGVertex()
-
-        num_uv_sets = vertex_buffer_format.getNumberOfTextureCoordinateSets(flags)
-        skip_dot3 = False
-        if(num_uv_sets > 0) and (vertex_buffer_format.getTextureCoordinateSetDimension(flags, num_uv_sets - 1) == 4):
-            skip_dot3 = True
-            num_uv_sets -= 1
-
-        v.texs = []
-
-        if vertex_buffer_format.hasPosition(flags):
-            v.pos =  Vector(iff.read_vector3())
-
-        if vertex_buffer_format.hasNormal(flags):
-            v.normal =  Vector(iff.read_vector3())
-
-        if vertex_buffer_format.hasPointSize(flags):
-            point_size = iff.read_float() # unused
-
-        if vertex_buffer_format.hasColor0(flags):
-            # NSG Seems like this should be ARGB per SOE code, but that makes 
-            # the Anchorhead Cantina look gross. Used trial and error to determine
-            # order: BGRA
-            b = iff.read_color()
-            g = iff.read_color()
-            r = iff.read_color()
-            a = iff.read_color()
-            v.color0 = [r,g,b,a]
-
-        if vertex_buffer_format.hasColor1(flags):
-            # NSG Seems like this should be ARGB per SOE code, but that makes 
-            # the Anchorhead Cantina look gross. Used trial and error to determine
-            # order: BGRA
-            b = iff.read_color()
-            g = iff.read_color()
-            r = iff.read_color()
-            a = iff.read_color()
-            v.color1 = [r,g,b,a]
-
-        for i in range(0, num_uv_sets):
-            dim = vertex_buffer_format.getTextureCoordinateSetDimension(flags, i)
-            v.texs.append([]) 
-            for j in range(0, dim):
-                v.texs[i].append(iff.read_float())
-
-        if skip_dot3:
-            iff.read_float()
-            iff.read_float()
-            iff.read_float()
-            iff.read_float()
-
-        return v
+    def shader_names(self):
+        # Just the SPS shader names, found through the block index so none of
+        # the vertex or index data is read
+        iff = nsg_iff.IFF(filename=self.filename, use_mmap=True)
+        names = []
+        for entry in iff.findChunks("NAME"):
+            if "/SPS /" in entry.path:
+                names.append(bytes(iff.getChunkData(entry)).split(b'\0')[0].decode('ASCII'))
+        iff.close()
+        return names
 
     def update_vertex(self, flags, iff, dx, dy, dz):
         v = SWGVertex()
@@ -1792,13 +1826,11 @@ class SWGMesh(object):
                 bit_flag = iff.read_int32()
                 #self.debug_flags(bit_flag, sps_no)
                 num_verts = iff.read_uint32()
-                verts = [None] * num_verts
                 iff.exitChunk("INFO")
 
                 iff.enterChunk("DATA")
-                for i in range(0, num_verts):
-                    verts[i] = self.read_vertex(bit_flag, iff)
-
+                vertex_dtype = vertex_buffer_format.getVertexDtype(bit_flag)
+                vertex_data = np.frombuffer(iff.read_misc(num_verts * vertex_dtype.itemsize), dtype=vertex_dtype)
                 iff.exitChunk("DATA")
                 iff.exitForm("0003")
 
@@ -1806,33 +1838,28 @@ class SWGMesh(object):
 
                 size = iff.getCurrentLength()
                 iff.enterChunk("INDX")
-                indexes = []
                 index_count = iff.read_uint32()
-                bpi = (size - 4) // index_count
+                bpi = (size - 4) // index_count if index_count > 0 else 2
                 #print(f'Size: {size} Size - 4: {size - 4}, index_count: {index_count} bpi: {bpi}')
-                for i in range(index_count//3):
-                    tri = Triangle()
-                    if(bpi == 2):
-                        tri.p1 = iff.read_int16()
-                        tri.p2 = iff.read_int16()
-                        tri.p3 = iff.read_int16()
-                    elif(bpi == 4):
-                        tri.p1 = iff.read_int32()
-                        tri.p2 = iff.read_int32()
-                        tri.p3 = iff.read_int32()
-                    indexes.append(tri)
+                if bpi not in [2, 4]:
+                    print(f"Warning: SPS {sps_no} has unsupported index size: {bpi}")
+                    bpi = 2
+                index_dtype = np.dtype('<u2') if bpi == 2 else np.dtype('<u4')
+                num_tris = index_count // 3
+                indexes = np.frombuffer(iff.read_misc(num_tris * 3 * bpi), dtype=index_dtype).reshape(num_tris, 3)
                 #print(f'Read Index Count: {index_count}')
 
                 iff.exitChunk("INDX")
                 iff.exitForm(version)
-                print(f"SPS {sps_no} Shader: {sht} Version: {version} Verts: {len(verts)} Tris: {len(indexes)}")
+                print(f"SPS {sps_no} Shader: {sht} Version: {version} Verts: {num_verts} Tris: {len(indexes)}")
 
-                sps = SPS(sps_no, sht, bit_flag, verts, indexes)
+                sps = SPS(sps_no, sht, bit_flag, None, indexes)
+                sps.set_vertex_data(vertex_data)
 
-                real_shader_path = support.find_file(sps.shader, SWG_ROOT)
+                real_shader_path, real_shader = support.find_shader(sps.shader, SWG_ROOT)
                 if real_shader_path:
                     sps.full_shader_path = real_shader_path
-                    sps.real_shader = SWGShader(sps.full_shader_path)
+                    sps.real_shader = real_shader
                 else:
                     print(f"Couldn't locate real shader path for: {sps.shader}")
                 self.spss.append(sps)
@@ -1845,7 +1872,7 @@ class SWGMesh(object):
         return True
             
     def write(self, filename):
-        iff = nsg_iff.IFF(initial_size=512000)
+        iff = nsg_iff.IFFWriter()
         # - BEGIN MESH        
         iff.insertForm("MESH")
         iff.insertForm("0005")
@@ -1925,32 +1952,20 @@ class SWGMesh(object):
             #iff.insert_uint32(53765)
             iff.insert_uint32(sps.flags)
             self.debug_flags(sps.flags, i)
-            iff.insert_uint32(len(sps.verts))
+            iff.insert_uint32(sps.get_vertex_count())
             iff.exitChunk("INFO")
             iff.insertChunk("DATA")
-            for v in sps.verts:
-                iff.insertFloatVector3((v.pos.x, v.pos.y, v.pos.z))
-                iff.insertFloatVector3((v.normal.x, v.normal.y, v.normal.z))
-
-                if vertex_buffer_format.hasColor0(sps.flags):
-                    iff.insert_color(v.color0)
-
-                if vertex_buffer_format.hasColor1(sps.flags):
-                    iff.insert_color(v.color1)
-                
-                for uv_set in v.texs:
-                    for value in uv_set:
-                        iff.insertFloat(value)
+            iff.insertArray(self.pack_vertices(sps))
             iff.exitChunk("DATA")
             iff.exitForm("0003")
             iff.exitForm("VTXA")
 
             iff.insertChunk("INDX")
-            iff.insert_uint32(len(sps.tris)*3)
-            for t in sps.tris:
-                iff.insert_uint16(t.p1)
-                iff.insert_uint16(t.p2)
-                iff.insert_uint16(t.p3)
+            indices = sps.get_indices()
+            iff.insert_uint32(indices.size)
+            # 16 bit indices can't address past 65535, the loader picks the
+            # width up from the chunk size
+            iff.insertArray(indices, '<u4' if sps.get_vertex_count() > 65535 else '<u2')
             iff.exitChunk("INDX")
 
             iff.exitForm("0001")
@@ -1971,7 +1986,7 @@ class SWGBLendShape(object):
         self.dot3 = None
 
     def __str__(self):
-        return f"""Name: {self.name} Positions: {str(len(self.positions))} Norms: {str(len(self.normals))} DOT3: {(str(len(self.dot3)) if self.dot3 else "N/A")}"""
+        return f"""Name: {self.name} Positions: {str(len(self.positions))} Norms: {str(len(self.normals))} DOT3: {(str(len(self.dot3)) if self.dot3 is not None else "N/A")}"""
 
     def __repr__(self):
         return self.__str__()
@@ -2011,6 +2026,10 @@ class SWGPerShaderData(object):
             return self.name.split('/')[1].split('.')[0]
 
 class SWGMgn(object):
+    TWDT_DTYPE = np.dtype([('bone', '<u4'), ('weight', '<f4')])
+    BLEND_DELTA_DTYPE = np.dtype([('index', '<u4'), ('delta', '<f4', 3)])
+    OITL_DTYPE = np.dtype([('zone', '<i2'), ('tri', '<u4', 3)])
+
     def __init__(self, filename, root):
         global SWG_ROOT
         SWG_ROOT = root
@@ -2044,8 +2063,7 @@ class SWGMgn(object):
 
         self.twhd = []
         self.twdt = []
-
-        self.vertex_weights = []
+        self.weight_offsets = None
 
         self.blends = []
 
@@ -2077,7 +2095,7 @@ class SWGMgn(object):
                 self.positions: {len(self.positions)}
                 self.twhd: {len(self.twhd)}
                 self.twdt: {len(self.twdt)}
-                self.dot3: {(str(len(self.dot3)) if self.dot3 else "NA")}
+                self.dot3: {(str(len(self.dot3)) if self.dot3 is not None else "NA")}
                 self.occlusions: {', '.join(str(x) for x in self.occlusions)}
                 self.occlusion_zones: {((', '.join(str(x) for x in self.occlusion_zones)) if self.occlusion_zones else "NONE")}
                 self.dynamic_hardpoints: {((', '.join(str(x) for x in self.dynamic_hardpoints)) if self.dynamic_hardpoints else "NONE")}
@@ -2104,17 +2122,60 @@ class SWGMgn(object):
                 if weight[1] != before:
                     print(f"Vert {i} changed weight for bone {weight[0]} from {before} to {weight[1]}")
 
+    def set_vertex_weights(self, twhd, twdt):
+        self.twhd = np.asarray(twhd, dtype=np.uint32)
+        self.twdt = np.asarray(twdt, dtype=SWGMgn.TWDT_DTYPE)
+        # Vertex i's weights are twdt[weight_offsets[i]:weight_offsets[i + 1]]
+        self.weight_offsets = np.zeros(len(self.twhd) + 1, dtype=np.int64)
+        np.cumsum(self.twhd, out=self.weight_offsets[1:])
+        if self.weight_offsets[-1] != len(self.twdt):
+            print(f' *** WARN ***: TWHD references {self.weight_offsets[-1]} weights but TWDT has {len(self.twdt)}')
+
+    def get_vertex_weights(self, index):
+        return self.twdt[self.weight_offsets[index]:self.weight_offsets[index + 1]]
+
+    def get_weight_groups(self):
+        # Yields (bone, weight, vertex indices) once per distinct bone and weight pair
+        count = min(int(self.weight_offsets[-1]), len(self.twdt))
+        if count == 0:
+            return
+        verts = np.repeat(np.arange(len(self.twhd)), self.twhd)[:count]
+        twdt = self.twdt[:count]
+        order = np.lexsort((twdt['weight'], twdt['bone']))
+        bones = twdt['bone'][order]
+        weights = twdt['weight'][order]
+        starts = np.flatnonzero(np.concatenate(([True], (bones[1:] != bones[:-1]) | (weights[1:] != weights[:-1]))))
+        ends = np.append(starts[1:], count)
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            yield int(bones[start]), float(weights[start]), verts[order[start:end]]
+
+    def get_occlusion_indices(self):
+        # OZN name -> OZN index
+        indices = {}
+        for ozn in self.occlusions:
+            indices.setdefault(ozn[0], ozn[1])
+        return indices
+
+    def get_triangle_zones(self, num_tris):
+        # Dense OZC index per triangle; the first zone listing a triangle wins, -1 for none
+        zones = np.full(num_tris, -1, dtype=np.int16)
+        if self.occlusion_zones:
+            for i in reversed(range(len(self.occlusion_zones))):
+                tris = np.asarray(self.occlusion_zones[i][1], dtype=np.int64)
+                zones[tris[(tris >= 0) & (tris < num_tris)]] = i
+        return zones
+
     def compute_fully_occluded_zone_combination(self):
         result=set()
         if self.occlusion_zones and len(self.occlusion_zones) > 0:
+            occlusion_indices = self.get_occlusion_indices()
             for occ in self.occlusion_zones:
                 if len(occ[1]) == 0:
                     continue
                 else:
                     for name in occ[0].split(":"):
-                        for ozn in self.occlusions:
-                            if ozn[0] == name:
-                                result.add(ozn[1])
+                        if name in occlusion_indices:
+                            result.add(occlusion_indices[name])
         return result
 
         
@@ -2162,74 +2223,27 @@ class SWGMgn(object):
             self.bone_names.append(iff.read_string())
         iff.exitChunk("XFNM")
 
-        iff.enterChunk("POSN")  
-        self.positions = [0] * self.num_positions
-        i=0      
-        while not iff.atEndOfForm():
-            self.positions[i] = (iff.read_float(), iff.read_float(), -iff.read_float())
-            i += 1
+        iff.enterChunk("POSN")
+        self.positions = np.array(iff.read_array('<f4').reshape(-1, 3))
+        self.positions[:, 2] *= -1
         iff.exitChunk("POSN")
 
-        self.twhd = [0] * self.num_positions
-        i = 0
-        iff.enterChunk("TWHD")        
-        while not iff.atEndOfForm():
-            self.twhd[i] = iff.read_uint32()
-            i += 1
+        iff.enterChunk("TWHD")
+        twhd = iff.read_array('<u4')
         iff.exitChunk("TWHD")
 
-        iff.enterChunk("TWDT")     
-        self.twdt = [[0,0.0]] * self.num_transform_weight_data   
-        i = 0
-        while not iff.atEndOfForm():
-            self.twdt[i] = [iff.read_uint32(), iff.read_float()]
-            #print(f'Twdt: {i} ({str(self.twdt[i])})')
-            #print(f"TWDT[{i}] {self.twdt[i][0]} = {self.twdt[i][1]}")
-            i += 1
+        iff.enterChunk("TWDT")
+        self.set_vertex_weights(twhd, iff.read_array(SWGMgn.TWDT_DTYPE))
         iff.exitChunk("TWDT")
 
-        j = 0
-        i = 0
-        p = 0
-        self.vertex_weights = [None] * self.num_positions
-        for p, h in enumerate(self.twhd):
-            these_weights = []
-            sum=0
-            for x in range(0,h):
-                twdt = self.twdt[i]
-                sum += twdt[1]
-                these_weights.append(twdt)
-                i += 1
-            
-            # if sum != 1.0:
-            #     print(f' *** WARN ***: Vertex Weight sum for vert: {p} != 1.0 : {sum}')
-            self.vertex_weights[p] = these_weights
-            
-            # sorted_weights = sorted(these_weights, key=lambda x: x[0])
-            # for weight in sorted_weights:                
-            #     print(f"TWDT[{j}] {weight[0]} = {weight[1]}")
-            #     j+=1
-        
-        #self.normalize_vertex_weights(self.vertex_weights)
-
-        #self.positions = list(zip(self.positions, self.vertex_weights))
-
-        iff.enterChunk("NORM")     
-        self.normals = [None] * self.num_normals   
-        i = 0
-        while not iff.atEndOfForm():
-            self.normals[i] = (iff.read_float(), iff.read_float(), iff.read_float())
-            i += 1
+        iff.enterChunk("NORM")
+        self.normals = iff.read_array('<f4').reshape(-1, 3)
         iff.exitChunk("NORM")
 
         if iff.getCurrentName() == "DOT3":
-            iff.enterChunk("DOT3")     
+            iff.enterChunk("DOT3")
             num_dot3 = iff.read_uint32()
-            self.dot3 = [None] * num_dot3   
-            i = 0
-            while not iff.atEndOfForm():
-                self.dot3[i] = [iff.read_float(), iff.read_float(), iff.read_float(), iff.read_float()]
-                i += 1
+            self.dot3 = iff.read_array('<f4', num_dot3 * 4).reshape(-1, 4)
             iff.exitChunk("DOT3")
 
         if iff.getCurrentName() == "HPTS":
@@ -2269,23 +2283,18 @@ class SWGMgn(object):
 
                 if iff.getCurrentName() == "POSN":
                     iff.enterChunk("POSN")
-                    while not iff.atEndOfForm():
-                        blt.positions.append( (iff.read_uint32(), (iff.read_float(), iff.read_float(), iff.read_float())))
+                    blt.positions = iff.read_array(SWGMgn.BLEND_DELTA_DTYPE)
                     iff.exitChunk("POSN")
 
-                if iff.getCurrentName == "NORM":
+                if iff.getCurrentName() == "NORM":
                     iff.enterChunk("NORM")
-                    while not iff.atEndOfForm():
-                        blt.normals.append( (iff.read_uint32(), (iff.read_float(), iff.read_float(), iff.read_float())))
+                    blt.normals = iff.read_array(SWGMgn.BLEND_DELTA_DTYPE)
                     iff.exitChunk("NORM")
 
                 if iff.getCurrentName() == "DOT3":
                     iff.enterChunk("DOT3")     
                     num_dot3 = iff.read_int32()
-                    blt.dot3 = []
-                    #for i in range(0, num_dot3):
-                    while not iff.atEndOfForm():
-                        blt.dot3.append([(iff.read_int32(), (iff.read_float(), iff.read_float(), iff.read_float()))])
+                    blt.dot3 = iff.read_array(SWGMgn.BLEND_DELTA_DTYPE)
                     iff.exitChunk("DOT3")
 
                 iff.exitForm("BLT ")
@@ -2312,12 +2321,15 @@ class SWGMgn(object):
         if iff.getCurrentName() == "OZC ":
             iff.enterChunk("OZC ")
             self.occlusion_zones=[]
+            occlusion_names = {}
+            for ozn in self.occlusions:
+                occlusion_names.setdefault(ozn[1], ozn[0])
             while not iff.atEndOfForm():
                 this_zone=[]
                 count = iff.read_int16()
                 for i in range(0,count):
                     n = iff.read_int16()
-                    this_zone.append(next(x[0] for x in self.occlusions if x[1] == n))
+                    this_zone.append(occlusion_names[n])
                 self.occlusion_zones.append([":".join(this_zone),[]])
             iff.exitChunk("OZC ")
 
@@ -2340,10 +2352,10 @@ class SWGMgn(object):
 
             iff.enterChunk("NAME")
             psdt.name = iff.read_string()
-            real_shader_path = support.find_file(psdt.name, SWG_ROOT)
+            real_shader_path, real_shader = support.find_shader(psdt.name, SWG_ROOT)
             if real_shader_path:
                 psdt.full_shader_path = real_shader_path
-                psdt.real_shader = SWGShader(psdt.full_shader_path)
+                psdt.real_shader = real_shader
             else:
                 print(f"Couldn't locate real shader path for: {psdt.name}")
 
@@ -2351,15 +2363,11 @@ class SWGMgn(object):
 
             iff.enterChunk("PIDX")
             num = iff.read_uint32()
-            while not iff.atEndOfForm():
-                i = iff.read_uint32()
-                psdt.pidx.append(i)
-
+            psdt.pidx = iff.read_array('<u4')
             iff.exitChunk("PIDX")
 
             iff.enterChunk("NIDX")
-            while not iff.atEndOfForm():
-                psdt.nidx.append(iff.read_uint32())
+            psdt.nidx = iff.read_array('<u4')
             iff.exitChunk("NIDX")
 
             if iff.getCurrentName() == "DOT3":
@@ -2387,14 +2395,9 @@ class SWGMgn(object):
                 i = 0
                 while not iff.atEndOfForm(): 
                     dim = psdt.uv_dimensions[i]
-                    num = iff.getCurrentLength() // 4 // dim             
-                    psdt.uvs.append([None] * num)                 
                     iff.enterChunk("TCSD")
-                    for n in range(0, num):
-                        uv = []
-                        for m in range(0, dim):
-                            uv.append(iff.read_float())
-                        psdt.uvs[i][n] = uv
+                    uvs = iff.read_array('<f4')
+                    psdt.uvs.append(uvs[:len(uvs) // dim * dim].reshape(-1, dim))
                     iff.exitChunk("TCSD")                    
                     i += 1
                 iff.exitForm("TCSF")
@@ -2410,16 +2413,12 @@ class SWGMgn(object):
                 triangle_list = []
                 if prim_type == "OITL":
                     num_tris = iff.read_uint32()
-                    #for n in range(0, num_tris):
-                    while not iff.atEndOfForm():
-                        occ = iff.read_int16()
+                    oitl = iff.read_array(SWGMgn.OITL_DTYPE)
+                    for occ in oitl['zone'].tolist():
                         self.occlusion_zones[occ][1].append(global_tri_index)
                         global_tri_index += 1
-                        p1 = iff.read_int32()
-                        p2 = iff.read_int32()
-                        p3 = iff.read_int32()
-                        tri = Triangle(p1, p2, p3)
-                        triangle_list.append(tri)
+                    for p1, p2, p3 in oitl['tri'].tolist():
+                        triangle_list.append(Triangle(p1, p2, p3))
                     psdt.prims.append(triangle_list)
                 elif prim_type == "ITL ":
                     num_tris = iff.read_uint32()
@@ -2454,10 +2453,19 @@ class SWGMgn(object):
                 i += 1
         return i
 
+    @staticmethod
+    def pack_blend_deltas(deltas):
+        if isinstance(deltas, np.ndarray) and deltas.dtype == SWGMgn.BLEND_DELTA_DTYPE:
+            return deltas
+        packed = np.zeros(len(deltas), dtype=SWGMgn.BLEND_DELTA_DTYPE)
+        if len(deltas) > 0:
+            packed['index'] = [d[0] for d in deltas]
+            packed['delta'] = [d[1] for d in deltas]
+        return packed
+
     def write(self):
         tris_with_no_facemap=[]
-        iff = nsg_iff.IFF(initial_size=512000)
-        print(f"Name: {iff.getCurrentName()} Length: {iff.getCurrentLength()}")
+        iff = nsg_iff.IFFWriter()
         iff.insertForm("SKMG")
         iff.insertForm("0004")
 
@@ -2467,7 +2475,7 @@ class SWGMgn(object):
         iff.insert_int32(len(self.skeletons))
         iff.insert_int32(len(self.bone_names))
         iff.insert_int32(len(self.positions))
-        iff.insert_int32(len([vv for v in self.twdt for vv in v ]))
+        iff.insert_int32(len(self.twdt))
         iff.insert_int32(len(self.normals))
         iff.insert_int32(len(self.psdts))
         iff.insert_int32(len(self.blends))
@@ -2489,37 +2497,25 @@ class SWGMgn(object):
         iff.exitChunk("XFNM")
 
         iff.insertChunk("POSN")
-        for pos in self.positions:
-            #pos[0] = -pos[0]
-            iff.insertFloatVector3(pos)
+        iff.insertArray(np.array(self.positions, dtype=np.float32).reshape(-1, 3))
         iff.exitChunk("POSN")
 
         iff.insertChunk("TWHD")
-        for twdt in self.twdt:
-            iff.insert_uint32(len(twdt))
+        iff.insertArray(self.twhd, '<u4')
         iff.exitChunk("TWHD")
         
         iff.insertChunk("TWDT")
-        i = 0
-        for twdt in self.twdt:
-            sorted_weights=sorted(twdt, key=lambda x: x[1], reverse=True)
-            for weight in sorted_weights:
-                iff.insert_uint32(weight[0])
-                iff.insertFloat(weight[1])
-                #print(f"TWDT[{i}] {weight[0]} = {weight[1]}")
-                i += 1
+        iff.insertArray(np.asarray(self.twdt, dtype=SWGMgn.TWDT_DTYPE))
         iff.exitChunk("TWDT")
 
         iff.insertChunk("NORM")
-        for norm in self.normals:
-            iff.insertFloatVector3(norm)
+        iff.insertArray(np.array(self.normals, dtype=np.float32).reshape(-1, 3))
         iff.exitChunk("NORM") 
 
-        if self.dot3:
+        if self.dot3 is not None and len(self.dot3) > 0:
             iff.insertChunk("DOT3")
             iff.insert_uint32(len(self.dot3))
-            for dot3 in self.dot3:
-                iff.insertFloatVector4(dot3)
+            iff.insertArray(np.array(self.dot3, dtype=np.float32).reshape(-1, 4))
             iff.exitChunk("DOT3")
         
         if self.binary_hardpoints:
@@ -2539,23 +2535,17 @@ class SWGMgn(object):
                 iff.exitChunk("INFO")
 
                 iff.insertChunk("POSN")
-                for p in blend.positions:
-                    iff.insert_uint32(p[0])
-                    iff.insertFloatVector3(p[1])
+                iff.insertArray(SWGMgn.pack_blend_deltas(blend.positions))
                 iff.exitChunk("POSN")
 
                 iff.insertChunk("NORM")
-                for n in blend.normals:
-                    iff.insert_uint32(n[0])
-                    iff.insertFloatVector3(n[1])
+                iff.insertArray(SWGMgn.pack_blend_deltas(blend.normals))
                 iff.exitChunk("NORM")
 
-                if blend.dot3:
+                if blend.dot3 is not None and len(blend.dot3) > 0:
                     iff.insertChunk("DOT3")
                     iff.insert_uint32(len(blend.dot3))
-                    for n in blend.dot3:
-                        iff.insert_uint32(n[0])
-                        iff.insertFloatVector3(n[1])
+                    iff.insertArray(SWGMgn.pack_blend_deltas(blend.dot3))
                     iff.exitChunk("DOT3")
 
                 iff.exitForm("BLT ")
@@ -2578,15 +2568,15 @@ class SWGMgn(object):
 
         if self.occlusion_zones and len(self.occlusion_zones) > 0:
             iff.insertChunk("OZC ")
+            occlusion_indices = self.get_occlusion_indices()
             for i, occ in enumerate(self.occlusion_zones):
                 print(f"OZC {i}: {occ[0]} has tris: {str(len(occ[1]))}")
                 zones=occ[0].split(':')                
                 iff.insert_int16(len(zones))
                 for zone_name in zones:
-                    for zone in self.occlusions:
-                        if zone[0] == zone_name:
-                            iff.insert_int16(zone[1])
-                            print(f"Adding OZC {zone[1]} which is {zone_name}")
+                    if zone_name in occlusion_indices:
+                        iff.insert_int16(occlusion_indices[zone_name])
+                        print(f"Adding OZC {occlusion_indices[zone_name]} which is {zone_name}")
             iff.exitChunk("OZC ")
 
         occluded = [x for x in self.occlusions if x[2] == 1]            
@@ -2596,28 +2586,32 @@ class SWGMgn(object):
                     iff.insert_int16(occ[1])
             iff.exitChunk("ZTO ")
 
+        # flat index arrays whether the prims came from the exporter or from load()
+        prim_indices = [[np.array(prim, dtype=np.uint32).reshape(-1) for prim in psdt.prims] for psdt in self.psdts]
+
         global_tri_index=0
-        for psdt in self.psdts:
+        if self.occlusion_zones:
+            triangle_zones = self.get_triangle_zones(sum(len(prim) // 3 for prims in prim_indices for prim in prims))
+            tris_with_no_facemap = np.flatnonzero(triangle_zones == -1)
+            triangle_zones[tris_with_no_facemap] = 0
+        for psdt, prims in zip(self.psdts, prim_indices):
             iff.insertForm("PSDT")
             iff.insertChunk("NAME")
-            iff.insertChunkString(f'shader/{psdt.name}.sht')
+            iff.insertChunkString(psdt.name if psdt.name.startswith('shader/') else f'shader/{psdt.name}.sht')
             iff.exitChunk("NAME")
 
             iff.insertChunk("PIDX")
             iff.insert_uint32(len(psdt.pidx))
-            for pidx in psdt.pidx:
-                iff.insert_uint32(pidx)
+            iff.insertArray(psdt.pidx, '<u4')
             iff.exitChunk("PIDX")
 
             iff.insertChunk("NIDX")
-            for nidx in psdt.nidx:
-                iff.insert_uint32(nidx)
+            iff.insertArray(psdt.nidx, '<u4')
             iff.exitChunk("NIDX")
 
-            if psdt.dot3:
+            if psdt.dot3 is not None and len(psdt.dot3) > 0:
                 iff.insertChunk("DOT3")
-                for dot3 in psdt.dot3:
-                    iff.insert_uint32(dot3)
+                iff.insertArray(psdt.dot3, '<u4')
                 iff.exitChunk("DOT3")
 
             if len(psdt.uvs) > 0:
@@ -2630,43 +2624,34 @@ class SWGMgn(object):
                 iff.insertForm("TCSF")
                 for uv_set in psdt.uvs:
                     iff.insertChunk("TCSD")
-                    for uv in uv_set:
-                        iff.insertFloat(uv[0])
-                        iff.insertFloat(1 - uv[1]) 
+                    uvs = np.array(uv_set, dtype=np.float64).reshape(-1, 2)
+                    uvs[:, 1] = 1 - uvs[:, 1]
+                    iff.insertArray(uvs, '<f4')
                     iff.exitChunk("TCSD")
                 iff.exitForm("TCSF")
 
             iff.insertForm("PRIM")
             
             iff.insertChunk("INFO")
-            iff.insert_uint32(len(psdt.prims))
+            iff.insert_uint32(len(prims))
             iff.exitChunk("INFO")
 
             if self.occlusion_zones:
-                for prim in psdt.prims:
+                for prim in prims:
                     iff.insertChunk("OITL")
                     iff.insert_uint32(len(prim) // 3)
-                    for value in prim:
-                        if global_tri_index % 3 == 0:
-                            found=False
-                            for i, occ in enumerate(self.occlusion_zones):
-                                if (global_tri_index // 3) in occ[1]:
-                                    iff.insert_int16(i)
-                                    found=True
-                                    break
-                            if not found:
-                                #print(f"WARNING: Tri: {global_tri_index // 3} Not in any Face Map (occlusion zone). Assuming 0!")
-                                tris_with_no_facemap.append(global_tri_index)
-                                iff.insert_int16(0)
-                        iff.insert_uint32(value)
-                        global_tri_index += 1
+                    num_tris = len(prim) // 3
+                    oitl = np.zeros(num_tris, dtype=SWGMgn.OITL_DTYPE)
+                    oitl['zone'] = triangle_zones[global_tri_index:global_tri_index + num_tris]
+                    oitl['tri'] = prim[:num_tris * 3].reshape(-1, 3)
+                    global_tri_index += num_tris
+                    iff.insertArray(oitl)
                     iff.exitChunk("OITL")
             else:
-                for prim in psdt.prims:
+                for prim in prims:
                     iff.insertChunk("ITL ")
                     iff.insert_uint32(len(prim) // 3)
-                    for value in prim:
-                        iff.insert_uint32(value)
+                    iff.insertArray(prim, '<u4')
                     iff.exitChunk("ITL ")
             iff.exitForm("PRIM")
             
@@ -0,0 +1,264 @@
+# MIT License
+#
+# Copyright (c) 2022 Nick Rafalski
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os, hashlib, struct, zlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from . import asset_index
+
+# Converted copies of client textures live under cache_dir()/textures instead
+# of next to the source in the extract. The file name hashes the source path,
+# size and mtime, so an entry is reused across sessions until the source changes.
+
+def texture_dir():
+    path = os.path.join(asset_index.cache_dir(), "textures")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def cache_path(source_path, extension = ".png"):
+    st = os.stat(source_path)
+    key = hashlib.sha1(f"{os.path.abspath(source_path)}|{st.st_size}|{st.st_mtime_ns}".encode('utf-8')).hexdigest()[:20]
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(texture_dir(), f"{stem}_{key}{extension}")
+
+def is_cached(source_path):
+    return os.path.exists(cache_path(source_path))
+
+# DDS decoding and PNG encoding below only need NumPy, so textures can be
+# converted in worker processes where bpy isn't available. Anything the decoder
+# doesn't handle is left for load_shared_image to convert through Blender.
+
+DDSD_MIPMAPCOUNT = 0x20000
+DDPF_ALPHAPIXELS = 0x1
+DDPF_FOURCC = 0x4
+DDPF_RGB = 0x40
+
+def _expand_565(c):
+    c = c.astype(np.int32)
+    r = (c >> 11) & 31
+    g = (c >> 5) & 63
+    b = c & 31
+    return np.stack(((r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)), axis=-1)
+
+def _color_blocks(blocks, four_color_only):
+    # blocks: (N, 8) uint8 BC1 color blocks -> (N, 16, 4) RGBA
+    c0 = blocks[:, 0].astype(np.uint16) | (blocks[:, 1].astype(np.uint16) << 8)
+    c1 = blocks[:, 2].astype(np.uint16) | (blocks[:, 3].astype(np.uint16) << 8)
+    rgb0 = _expand_565(c0)
+    rgb1 = _expand_565(c1)
+    palette = np.zeros((len(blocks), 4, 4), dtype=np.int32)
+    palette[:, 0, :3] = rgb0
+    palette[:, 1, :3] = rgb1
+    palette[:, :, 3] = 255
+    four = (c0 > c1) | four_color_only
+    palette[:, 2, :3] = np.where(four[:, None], (2 * rgb0 + rgb1) // 3, (rgb0 + rgb1) // 2)
+    palette[:, 3, :3] = np.where(four[:, None], (rgb0 + 2 * rgb1) // 3, 0)
+    palette[:, 3, 3] = np.where(four, 255, 0)
+    bits = blocks[:, 4:8].copy().view('<u4').reshape(-1)
+    indices = (bits[:, None] >> (2 * np.arange(16, dtype=np.uint32))) & 3
+    return palette[np.arange(len(blocks))[:, None], indices]
+
+def _alpha_blocks_bc3(blocks):
+    # blocks: (N, 8) uint8 BC3 alpha blocks -> (N, 16) alpha
+    a0 = blocks[:, 0].astype(np.int32)[:, None]
+    a1 = blocks[:, 1].astype(np.int32)[:, None]
+    w8 = np.arange(1, 7)
+    w6 = np.arange(1, 5)
+    eight = ((7 - w8) * a0 + w8 * a1) // 7
+    six = np.concatenate((((5 - w6) * a0 + w6 * a1) // 5, np.zeros_like(a0), np.full_like(a0, 255)), axis=1)
+    palette = np.concatenate((a0, a1, np.where(a0 > a1, eight, six)), axis=1)
+    bits = np.zeros(len(blocks), dtype=np.uint64)
+    for b in range(6):
+        bits |= blocks[:, 2 + b].astype(np.uint64) << np.uint64(8 * b)
+    indices = (bits[:, None] >> (np.uint64(3) * np.arange(16, dtype=np.uint64))) & np.uint64(7)
+    return palette[np.arange(len(blocks))[:, None], indices.astype(np.int64)]
+
+def _alpha_blocks_bc2(blocks):
+    # blocks: (N, 8) uint8 explicit 4 bit alpha -> (N, 16) alpha
+    nibbles = np.stack((blocks & 15, blocks >> 4), axis=-1).reshape(len(blocks), 16)
+    return nibbles.astype(np.int32) * 17
+
+def _unblock(pixels, width, height):
+    # (N, 16, 4) in block order -> (height, width, 4)
+    bw = max(1, (width + 3) // 4)
+    bh = max(1, (height + 3) // 4)
+    image = pixels.reshape(bh, bw, 4, 4, 4).transpose(0, 2, 1, 3, 4).reshape(bh * 4, bw * 4, 4)
+    return image[:height, :width]
+
+def _mask_channel(values, mask):
+    if mask == 0:
+        return None
+    shift = (mask & -mask).bit_length() - 1
+    bits = bin(mask).count("1")
+    channel = (values & mask) >> shift
+    return (channel * 255 // ((1 << bits) - 1)).astype(np.uint8)
+
+def decode_dds(data):
+    # Top mip level of a DXT1/3/5 or uncompressed RGB(A) DDS as a
+    # (height, width, 4) uint8 array, or None if the format isn't handled
+    if len(data) < 128 or data[:4] != b"DDS ":
+        return None
+    height, width = struct.unpack_from("<II", data, 12)
+    pf_flags, fourcc, bit_count, r_mask, g_mask, b_mask, a_mask = struct.unpack_from("<I4sIIIII", data, 80)
+    body = memoryview(data)[128:]
+    num_blocks = max(1, (width + 3) // 4) * max(1, (height + 3) // 4)
+
+    if pf_flags & DDPF_FOURCC:
+        if fourcc == b"DXT1":
+            blocks = np.frombuffer(body, dtype=np.uint8, count=num_blocks * 8).reshape(-1, 8)
+            return _unblock(_color_blocks(blocks, False), width, height).astype(np.uint8)
+        if fourcc in (b"DXT2", b"DXT3", b"DXT4", b"DXT5"):
+            blocks = np.frombuffer(body, dtype=np.uint8, count=num_blocks * 16).reshape(-1, 16)
+            pixels = _color_blocks(blocks[:, 8:], True)
+            if fourcc in (b"DXT2", b"DXT3"):
+                pixels[:, :, 3] = _alpha_blocks_bc2(blocks[:, :8])
+            else:
+                pixels[:, :, 3] = _alpha_blocks_bc3(blocks[:, :8])
+            return _unblock(pixels, width, height).astype(np.uint8)
+        return None
+
+    if pf_flags & DDPF_RGB and bit_count in (24, 32):
+        stride = bit_count // 8
+        raw = np.frombuffer(body, dtype=np.uint8, count=width * height * stride).reshape(-1, stride)
+        values = np.zeros(len(raw), dtype=np.uint32)
+        for b in range(stride):
+            values |= raw[:, b].astype(np.uint32) << (8 * b)
+        image = np.full((len(raw), 4), 255, dtype=np.uint8)
+        for c, mask in enumerate((r_mask, g_mask, b_mask, a_mask if pf_flags & DDPF_ALPHAPIXELS else 0)):
+            channel = _mask_channel(values, mask)
+            if channel is not None:
+                image[:, c] = channel
+        return image.reshape(height, width, 4)
+    return None
+
+def encode_png(image):
+    # (height, width, 4) uint8 -> PNG file bytes
+    height, width = image.shape[:2]
+    def chunk(tag, payload):
+        return struct.pack(">I", len(payload)) + tag + payload + struct.pack(">I", zlib.crc32(tag + payload) & 0xffffffff)
+    rows = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    rows[:, 1:] = np.ascontiguousarray(image).reshape(height, width * 4)
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows.tobytes(), 6))
+            + chunk(b"IEND", b""))
+
+def convert_to_png(source_path, png_path):
+    # Runs in the worker processes. False leaves the texture for Blender
+    with open(source_path, 'rb') as f:
+        image = decode_dds(f.read())
+    if image is None:
+        return False
+    temp_path = f"{png_path}.{os.getpid()}.png"
+    with open(temp_path, 'wb') as f:
+        f.write(encode_png(image))
+    os.replace(temp_path, png_path)
+    return True
+
+def missing_jobs(source_paths):
+    # {source: png} for every texture in source_paths with no cache entry yet
+    jobs = {}
+    for source_path in dict.fromkeys(source_paths):
+        if source_path.lower().endswith(".dds"):
+            try:
+                png_path = cache_path(source_path)
+            except OSError as e:
+                # gone since the asset index was built, load_shared_image looks again
+                print(f"Couldn't read texture {source_path}: {e}")
+                continue
+            if not os.path.exists(png_path):
+                jobs[source_path] = png_path
+    return jobs
+
+def start_pool(max_workers = None):
+    # None if worker processes can't be started, callers then convert in this process
+    try:
+        # spawn, not fork, since forking Blender isn't safe
+        return ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1,
+                                   mp_context=multiprocessing.get_context("spawn"))
+    except (OSError, RuntimeError) as e:
+        print(f"Couldn't start texture workers ({e}), converting in this process")
+        return None
+
+def submit_jobs(pool, jobs):
+    # {source: future}. Without a pool the conversions run right here and the
+    # futures come back already finished
+    futures = {}
+    for source_path, png_path in jobs.items():
+        try:
+            if pool is None:
+                raise BrokenProcessPool()
+            futures[source_path] = pool.submit(convert_to_png, source_path, png_path)
+        except BrokenProcessPool:
+            futures[source_path] = _run_here(convert_to_png, source_path, png_path)
+    return futures
+
+def job_result(future, source_path, png_path):
+    try:
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            # the workers couldn't start (e.g. can't import this add-on)
+            return convert_to_png(source_path, png_path)
+    except Exception as e:
+        print(f"Error converting {source_path}: {e}")
+        return False
+
+def convert_missing(source_paths, progress = None, max_workers = None):
+    # Converts every texture in source_paths that has no cache entry yet, in a
+    # process pool. progress(done, total, source_path, converted) is called
+    # from this thread as each one finishes. Returns how many were converted
+    jobs = missing_jobs(source_paths)
+    if len(jobs) == 0:
+        return 0
+
+    pool = None
+    if len(jobs) > 1 and max_workers != 1:
+        pool = start_pool(min(max_workers or os.cpu_count() or 1, len(jobs)))
+    if pool:
+        futures = {future: source_path for source_path, future in submit_jobs(pool, jobs).items()}
+        results = ((futures[f], f) for f in as_completed(futures))
+    else:
+        results = ((s, _run_here(convert_to_png, s, d)) for s, d in jobs.items())
+
+    converted = 0
+    try:
+        for done, (source_path, future) in enumerate(results, 1):
+            ok = job_result(future, source_path, jobs[source_path])
+            converted += ok
+            if progress:
+                progress(done, len(jobs), source_path, ok)
+    finally:
+        if pool:
+            pool.shutdown()
+    return converted
+
+def _run_here(fn, *args):
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
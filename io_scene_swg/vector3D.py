@@ -26,6 +26,12 @@ class Vector3D(object):
         self.x = x
         self.y = y
         self.z = z
+    def __len__(self):
+        return 3
+    def __getitem__(self, i):
+        return (self.x, self.y, self.z)[i]
+    def __iter__(self):
+        return iter((self.x, self.y, self.z))
     def __neg__(self):
         return Vector3D(-self.x, -self.y, -self.z)
     def __add__(self, b):
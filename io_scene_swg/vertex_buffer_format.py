@@ -20,6 +20,8 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import numpy as np
+
 TextureCoordinateSetCountShift = 8
 TextureCoordinateSetCountMask = 15
 
@@ -169,3 +171,28 @@ def setTextureCoordinateSetDimension(flags, textureCoordinateSet, dimension):
     shift = (TextureCoordinateSetDimensionBaseShift + (textureCoordinateSet * TextureCoordinateSetDimensionPerSetShift))
     flags = (flags & ~((TextureCoordinateSetDimensionMask) << shift)) | ((dimension - TextureCoordinateSetDimensionAdjustment) << shift)
     return flags
+
+def getVertexDtype(flags):
+    # Layout of one vertex in a VTXA DATA chunk. A 4D last texture coordinate
+    # set is the DOT3 tangent. Colors are stored BGRA
+    fields = []
+    if hasPosition(flags):
+        fields.append(('position', '<f4', 3))
+    if hasNormal(flags):
+        fields.append(('normal', '<f4', 3))
+    if hasPointSize(flags):
+        fields.append(('pointSize', '<f4'))
+    if hasColor0(flags):
+        fields.append(('color0', 'u1', 4))
+    if hasColor1(flags):
+        fields.append(('color1', 'u1', 4))
+
+    num_uv_sets = getNumberOfTextureCoordinateSets(flags)
+    has_dot3 = (num_uv_sets > 0) and (getTextureCoordinateSetDimension(flags, num_uv_sets - 1) == 4)
+    if has_dot3:
+        num_uv_sets -= 1
+    for i in range(0, num_uv_sets):
+        fields.append((f'uv{i}', '<f4', getTextureCoordinateSetDimension(flags, i)))
+    if has_dot3:
+        fields.append(('dot3', '<f4', 4))
+    return np.dtype(fields)
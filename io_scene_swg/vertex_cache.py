@@ -0,0 +1,152 @@
+# MIT License
+#
+# Copyright (c) 2022 Nick Rafalski
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import numpy as np
+
+# Tom Forsyth's "Linear-Speed Vertex Cache Optimisation" scoring
+CACHE_SIZE = 32
+CACHE_DECAY_POWER = 1.5
+LAST_TRI_SCORE = 0.75
+VALENCE_BOOST_SCALE = 2.0
+VALENCE_BOOST_POWER = 0.5
+MAX_VALENCE = 64
+
+# FIFO size used when reporting ACMR
+ACMR_CACHE_SIZE = 16
+
+def _score_tables():
+    cache = np.zeros(CACHE_SIZE + 1)
+    cache[:3] = LAST_TRI_SCORE
+    cache[3:CACHE_SIZE] = (1.0 - (np.arange(3, CACHE_SIZE) - 3) / (CACHE_SIZE - 3)) ** CACHE_DECAY_POWER
+    # index CACHE_SIZE is "not in cache"
+    cache[CACHE_SIZE] = 0.0
+    valence = np.zeros(MAX_VALENCE + 1)
+    valence[1:] = VALENCE_BOOST_SCALE * np.arange(1, MAX_VALENCE + 1) ** -VALENCE_BOOST_POWER
+    return cache.tolist(), valence.tolist()
+
+CACHE_SCORES, VALENCE_SCORES = _score_tables()
+
+def vertex_score(cache_position, remaining):
+    if remaining == 0:
+        return -1.0
+    return CACHE_SCORES[cache_position] + VALENCE_SCORES[min(remaining, MAX_VALENCE)]
+
+def acmr(tris, cache_size = ACMR_CACHE_SIZE):
+    # Average cache miss ratio (vertex transforms per triangle) of a FIFO cache
+    tris = np.asarray(tris).reshape(-1, 3)
+    if len(tris) == 0:
+        return 0.0
+    cache = []
+    cached = set()
+    misses = 0
+    for v in tris.ravel().tolist():
+        if v not in cached:
+            misses += 1
+            cache.append(v)
+            cached.add(v)
+            if len(cache) > cache_size:
+                cached.discard(cache.pop(0))
+    return misses / len(tris)
+
+def optimize_triangle_order(tris, num_verts):
+    # Returns the order to emit the (N,3) triangles in
+    tris = np.asarray(tris, dtype=np.int64).reshape(-1, 3)
+    num_tris = len(tris)
+    if num_tris == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # vertex -> triangles, CSR
+    flat = tris.ravel()
+    vert_tris = np.argsort(flat, kind='stable') // 3
+    valence = np.bincount(flat, minlength=num_verts)
+    offsets = np.concatenate(([0], np.cumsum(valence))).tolist()
+    vert_tris = vert_tris.tolist()
+    tri_verts = tris.tolist()
+    remaining = valence.tolist()
+
+    scores = [vertex_score(CACHE_SIZE, r) for r in remaining]
+    tri_scores = [scores[a] + scores[b] + scores[c] for a, b, c in tri_verts]
+    added = [False] * num_tris
+
+    order = []
+    cache = []
+    best = max(range(num_tris), key=tri_scores.__getitem__)
+    cursor = 0
+    while best != -1:
+        added[best] = True
+        order.append(best)
+        tri = tri_verts[best]
+
+        for v in tri:
+            remaining[v] -= 1
+        # most recently used first
+        front = list(dict.fromkeys(tri))
+        cache = front + [v for v in cache if v not in front]
+        evicted = cache[CACHE_SIZE:]
+        cache = cache[:CACHE_SIZE]
+
+        best = -1
+        best_score = -1.0
+        for position, v in enumerate(cache + evicted):
+            position = min(position, CACHE_SIZE)
+            score = vertex_score(position, remaining[v])
+            delta = score - scores[v]
+            scores[v] = score
+            for t in vert_tris[offsets[v]:offsets[v + 1]]:
+                if added[t]:
+                    continue
+                tri_scores[t] += delta
+                if position < CACHE_SIZE and tri_scores[t] > best_score:
+                    best_score = tri_scores[t]
+                    best = t
+
+        if best == -1:
+            # Nothing left touching the cache; carry on from the next unused triangle
+            while cursor < num_tris and added[cursor]:
+                cursor += 1
+            best = cursor if cursor < num_tris else -1
+
+    return np.array(order, dtype=np.int64)
+
+def order_vertices_by_first_use(tris, num_verts):
+    # Returns (vertex_order, remapped tris). vertex_order[new] = old; unreferenced
+    # vertices keep their relative order at the end
+    tris = np.asarray(tris, dtype=np.int64).reshape(-1, 3)
+    flat = tris.ravel()
+    first_use = np.full(num_verts, len(flat), dtype=np.int64)
+    np.minimum.at(first_use, flat, np.arange(len(flat)))
+    vertex_order = np.argsort(first_use, kind='stable')
+    remap = np.empty(num_verts, dtype=np.int64)
+    remap[vertex_order] = np.arange(num_verts)
+    return vertex_order, remap[tris]
+
+def optimize(tris, num_verts, label = ""):
+    # Forsyth triangle order then first-use vertex order. Returns
+    # (triangle_order, vertex_order, new_tris) and prints ACMR before and after
+    tris = np.asarray(tris, dtype=np.int64).reshape(-1, 3)
+    before = acmr(tris)
+    triangle_order = optimize_triangle_order(tris, num_verts)
+    vertex_order, new_tris = order_vertices_by_first_use(tris[triangle_order], num_verts)
+    after = acmr(new_tris)
+    print(f"{label} vertex cache: {len(tris)} tris, {num_verts} verts. ACMR {before:.3f} -> {after:.3f}")
+    return triangle_order, vertex_order, new_tris